@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from importlib import metadata
+from typing import Any, Callable, List, Optional
+
+_META_FILE_NAME = 'meta.json'
+_TEMP_PREFIX = '.tmp-'
+_TRASH_PREFIX = '.trash-'
+_STALE_TEMP_SECS = 24 * 60 * 60
+
+
+def framework_version(package_name: str) -> str:
+    try:
+        return metadata.version(package_name)
+    except metadata.PackageNotFoundError:
+        return 'unknown'
+
+
+class ArtifactStore:
+    """
+    Store of the fitted models shared by the runs of the benchmark.
+    The entry is addressed by the hash of the training data, the framework,
+    the hyperparameters and the versions of the packages, so the changed data or
+    configuration never reuses the stale model. The entries are written to the temporary
+    directories and renamed into place, so the concurrent readers see either the complete
+    entry or no entry. The least recently used entries are removed when the size limit is exceeded.
+
+    :param root_dir: directory to keep the entries in
+    :param max_size_mb: size limit of all the entries
+    """
+
+    def __init__(self, root_dir: str, max_size_mb: float = 20 * 1024):
+        self.root_dir = root_dir
+        self.max_size_mb = max_size_mb
+
+    @staticmethod
+    def artifact_key(framework: str, hyperparameters: dict, data_hash: str,
+                     packages: Optional[List[str]] = None) -> str:
+        """
+        :param framework: name of the framework
+        :param hyperparameters: all the parameters that affect the fit
+        :param data_hash: hash of the training data
+        :param packages: packages with the versions that affect the fit (the framework package by default)
+        """
+        packages = packages or [framework]
+        description = {'framework': framework,
+                       'hyperparameters': hyperparameters,
+                       'data_hash': data_hash,
+                       'versions': {package: framework_version(package) for package in packages}}
+        content = json.dumps(description, sort_keys=True, default=str)
+        return f'{framework}-{hashlib.sha256(content.encode()).hexdigest()}'
+
+    def entry_dir(self, key: str) -> str:
+        return os.path.join(self.root_dir, key)
+
+    def load(self, key: str, loader: Callable[[str], Any]) -> Optional[Any]:
+        """ Returns the artifact read by the loader from the entry directory or None if there is no entry """
+        entry_dir = self.entry_dir(key)
+        meta_path = os.path.join(entry_dir, _META_FILE_NAME)
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            artifact = loader(entry_dir)
+            # the modification time of the metadata is the last access time of the entry
+            os.utime(meta_path)
+        except Exception as ex:
+            # the entry could be evicted by another process while it was read
+            print(f'Artifact {key} load error {ex}')
+            return None
+        return artifact
+
+    def save(self, key: str, saver: Callable[[str], None], meta: Optional[dict] = None):
+        """ Writes the entry with the saver that puts the artifact files into the given directory """
+        os.makedirs(self.root_dir, exist_ok=True)
+        temp_dir = os.path.join(self.root_dir, f'{_TEMP_PREFIX}{key}-{uuid.uuid4().hex}')
+        os.makedirs(temp_dir)
+        try:
+            saver(temp_dir)
+            with open(os.path.join(temp_dir, _META_FILE_NAME), 'w') as file:
+                json.dump({'key': key, 'created': time.time(), **(meta or {})}, file, indent=4, default=str)
+            try:
+                os.rename(temp_dir, self.entry_dir(key))
+            except OSError:
+                # the same entry was written by another process
+                if not os.path.exists(os.path.join(self.entry_dir(key), _META_FILE_NAME)):
+                    raise
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        self.evict(keep_keys=[key])
+
+    def evict(self, keep_keys: Optional[List[str]] = None):
+        """ Removes the least recently used entries until the store fits the size limit """
+        keep_keys = set(keep_keys or [])
+        entries = []
+        for name in os.listdir(self.root_dir):
+            path = os.path.join(self.root_dir, name)
+            if name.startswith(_TEMP_PREFIX) or name.startswith(_TRASH_PREFIX):
+                # the leftovers of the interrupted writes and evictions
+                if time.time() - os.path.getmtime(path) > _STALE_TEMP_SECS:
+                    shutil.rmtree(path, ignore_errors=True)
+                continue
+            meta_path = os.path.join(path, _META_FILE_NAME)
+            if os.path.exists(meta_path):
+                entries.append((os.path.getmtime(meta_path), name, _dir_size_mb(path)))
+
+        total_size_mb = sum(size_mb for _, _, size_mb in entries)
+        for _, name, size_mb in sorted(entries):
+            if total_size_mb <= self.max_size_mb:
+                break
+            if name in keep_keys:
+                continue
+            self._remove_entry(name)
+            total_size_mb -= size_mb
+
+    def _remove_entry(self, key: str):
+        # the entry disappears at once for the readers and is deleted afterwards
+        trash_dir = os.path.join(self.root_dir, f'{_TRASH_PREFIX}{key}-{uuid.uuid4().hex}')
+        try:
+            os.rename(self.entry_dir(key), trash_dir)
+        except OSError:
+            return
+        shutil.rmtree(trash_dir, ignore_errors=True)
+
+
+def _dir_size_mb(dir_path: str) -> float:
+    size = 0
+    for root, _, file_names in os.walk(dir_path):
+        for file_name in file_names:
+            try:
+                size += os.path.getsize(os.path.join(root, file_name))
+            except OSError:
+                pass
+    return size / 1024 / 1024
@@ -1,28 +1,32 @@
 import xgboost as xgb
 
-from fedot.core.data.data import InputData
+from dataset_store import case_input_data
 from fedot.core.repository.tasks import TaskTypesEnum
+from resource_usage import measure_phase
 
 
 def run_xgboost(params: 'ExecutionParams'):
-    train_file_path = params.train_file
-    test_file_path = params.test_file
     task = params.task
 
-    train_data = InputData.from_csv(train_file_path)
-    test_data = InputData.from_csv(test_file_path)
+    with measure_phase('load'):
+        train_data, test_data = case_input_data(params)
 
     if task == TaskTypesEnum.classification:
-        model = xgb.XGBClassifier(max_depth=2, learning_rate=1.0, objective='binary:logistic')
-        model.fit(train_data.features, train_data.target)
-        predicted = model.predict_proba(test_data.features)[:, 1]
-        predicted_labels = model.predict(test_data.features)
+        model = xgb.XGBClassifier(max_depth=2, learning_rate=1.0, objective='binary:logistic',
+                                  n_jobs=params.n_jobs)
+        with measure_phase('fit'):
+            model.fit(train_data.features, train_data.target)
+        with measure_phase('predict'):
+            predicted = model.predict_proba(test_data.features)[:, 1]
+            predicted_labels = model.predict(test_data.features)
 
     elif task == TaskTypesEnum.regression:
         xgbr = xgb.XGBRegressor(max_depth=3, learning_rate=0.3, n_estimators=300,
-                                objective='reg:squarederror')
-        xgbr.fit(train_data.features, train_data.target)
-        predicted = xgbr.predict(test_data.features)
+                                objective='reg:squarederror', n_jobs=params.n_jobs)
+        with measure_phase('fit'):
+            xgbr.fit(train_data.features, train_data.target)
+        with measure_phase('predict'):
+            predicted = xgbr.predict(test_data.features)
         predicted_labels = None
 
     else:
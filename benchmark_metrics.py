@@ -0,0 +1,225 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+PROBS_METRICS = ['roc_auc']
+LABEL_METRICS = ['f1', 'accuracy', 'precision', 'balanced_accuracy']
+REGRESSION_METRICS = ['mse', 'r2']
+
+
+def compute_metrics(metric_list: List[str], target, predicted_probs=None,
+                    predicted_labels=None, sample_weight=None, batch: bool = False) -> Dict[str, np.ndarray]:
+    """
+    Calculates the metrics with the shared intermediate results: one sorting of the scores
+    for roc_auc, one confusion matrix for the label metrics and one residual vector for
+    the regression metrics. The metrics are equal to the ones from sklearn.metrics with
+    the default parameters: f1, precision and roc_auc are defined for the binary target only
+    (the undefined values, i.e. roc_auc for the single class, are nan).
+
+    :param metric_list: names of the metrics to calculate
+    :param target: true values (or class labels of any type) as a vector,
+    or as a matrix with the vector per row in the batch mode
+    :param predicted_probs: predicted probabilities of the greater class (or values for regression)
+    as a vector, or as a matrix with the prediction per row in the batch mode
+    (i.e. the predictions for several seeds or folds)
+    :param predicted_labels: predicted labels in the same form as predicted_probs
+    :param sample_weight: weights of the samples as a vector, or as a matrix with the weights per row
+    in the batch mode (i.e. the counts of the samples in the bootstrap resamples)
+    :param batch: if True, the matrices are the batches of the vectors, otherwise all the values
+    are the vectors (the column vectors are accepted)
+    :return: dict with the metric values, the value is the float without the batch mode and
+    the array with the value per row in the batch mode
+    """
+    unknown_metrics = set(metric_list) - set(PROBS_METRICS + LABEL_METRICS + REGRESSION_METRICS)
+    if unknown_metrics:
+        raise ValueError(f'Metrics {sorted(unknown_metrics)} are not supported')
+
+    target = _as_rows(target, batch)
+    weights = np.ones((1, target.shape[1])) if sample_weight is None else _as_rows(sample_weight, batch)
+
+    result = {}
+    probs_metrics = [name for name in metric_list if name in PROBS_METRICS + REGRESSION_METRICS]
+    if probs_metrics:
+        probs = _as_rows(predicted_probs, batch).astype(float)
+        if 'roc_auc' in probs_metrics:
+            result['roc_auc'] = _roc_auc(target, probs, weights)
+        if set(probs_metrics) & set(REGRESSION_METRICS):
+            result.update(_regression_metrics(target.astype(float), probs, weights))
+
+    label_metrics = [name for name in metric_list if name in LABEL_METRICS]
+    if label_metrics:
+        result.update(_label_metrics(target, _as_rows(predicted_labels, batch), weights,
+                                     binary_only='f1' in label_metrics or 'precision' in label_metrics))
+
+    return {name: result[name] if batch else float(result[name][0]) for name in metric_list}
+
+
+def bootstrap_metrics(metric_list: List[str], target, predicted_probs=None, predicted_labels=None,
+                      samples_num: int = 1000, confidence: float = 0.95, seed: int = 42,
+                      max_chunk_elements: int = 10 ** 7) -> Dict[str, Dict[str, float]]:
+    """
+    Estimates the percentile bootstrap confidence intervals of the metrics.
+    The resamples are drawn as the matrix of indices, which is converted to the matrix of
+    the sample counts and scored by compute_metrics as the weights of the original samples,
+    so the scores are sorted only once. The matrices are processed in chunks to bound
+    the memory by max_chunk_elements values.
+
+    :param metric_list: names of the metrics to calculate
+    :param target: true values of the test sample
+    :param predicted_probs: predicted probabilities (or values for regression)
+    :param predicted_labels: predicted labels
+    :param samples_num: number of the bootstrap resamples
+    :param confidence: confidence level of the intervals
+    :param seed: seed of the resampling
+    :param max_chunk_elements: maximal size of the resamples matrix scored at once
+    :return: dict with the lower and the upper bounds and the standard deviation for every metric
+    (the resamples with the undefined metric, i.e. with the single class for roc_auc, are ignored)
+    """
+    samples_size = _as_rows(target, batch=False).shape[1]
+    chunk_size = max(1, min(samples_num, max_chunk_elements // max(samples_size, 1)))
+
+    random_state = np.random.RandomState(seed)
+    chunks_metrics = []
+    for chunk_start in range(0, samples_num, chunk_size):
+        resamples_num = min(chunk_size, samples_num - chunk_start)
+        resample_ids = random_state.randint(0, samples_size, size=(resamples_num, samples_size))
+        flat_ids = resample_ids + np.arange(resamples_num)[:, np.newaxis] * samples_size
+        counts = np.bincount(flat_ids.ravel(), minlength=resamples_num * samples_size)
+        counts = counts.reshape(resamples_num, samples_size)
+        chunks_metrics.append(compute_metrics(metric_list, target, predicted_probs=predicted_probs,
+                                              predicted_labels=predicted_labels, sample_weight=counts,
+                                              batch=True))
+
+    alpha = (1 - confidence) / 2
+    intervals = {}
+    for metric_name in metric_list:
+        values = np.concatenate([np.atleast_1d(chunk_metrics[metric_name]) for chunk_metrics in chunks_metrics])
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            intervals[metric_name] = {'low': np.nan, 'high': np.nan, 'std': np.nan}
+            continue
+        low, high = np.quantile(values, [alpha, 1 - alpha])
+        intervals[metric_name] = {'low': float(low), 'high': float(high), 'std': float(np.std(values))}
+    return intervals
+
+
+def _as_rows(values, batch: bool) -> np.ndarray:
+    values = np.asarray(values)
+    if not batch:
+        if values.ndim == 2 and values.shape[1] == 1:
+            # the column vector is the single prediction
+            values = values[:, 0]
+        if values.ndim != 1:
+            # the same error as sklearn, i.e. for the matrix of the probabilities of the classes
+            raise ValueError(f'y should be a 1d array, got an array of shape {values.shape} instead.')
+    if values.ndim == 1:
+        values = values[np.newaxis, :]
+    return values
+
+
+def _roc_auc(target: np.ndarray, scores: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    classes = np.unique(target)
+    if len(classes) > 2:
+        # sklearn requires the multi_class strategy and the probabilities of all the classes
+        raise ValueError("multi_class must be in ('ovo', 'ovr')")
+    target, scores = np.broadcast_arrays(target, scores)
+    samples_ids = np.arange(scores.shape[1])
+    order = np.argsort(scores, axis=1, kind='mergesort')
+    sorted_scores = np.take_along_axis(scores, order, axis=1)
+    # the greater class is the positive one as in sklearn
+    is_positive = np.take_along_axis(target, order, axis=1) == classes[-1]
+    # the weights rows (i.e. the bootstrap resamples) share the sorting of the scores
+    sorted_weights = np.take_along_axis(weights, order, axis=1)
+    positive_weights = np.where(is_positive, sorted_weights, 0)
+    negative_weights = sorted_weights - positive_weights
+
+    # the tied scores form the groups: the positive sample outranks the negatives of
+    # the previous groups and a half of the negatives of its own group (Mann-Whitney statistic)
+    is_group_start = np.ones_like(sorted_scores, dtype=bool)
+    is_group_start[:, 1:] = sorted_scores[:, 1:] != sorted_scores[:, :-1]
+    is_group_end = np.ones_like(sorted_scores, dtype=bool)
+    is_group_end[:, :-1] = is_group_start[:, 1:]
+    group_start_ids = np.maximum.accumulate(np.where(is_group_start, samples_ids, 0), axis=1)
+    group_end_ids = np.minimum.accumulate(np.where(is_group_end, samples_ids, len(samples_ids))[:, ::-1],
+                                          axis=1)[:, ::-1]
+
+    negatives_through = np.cumsum(negative_weights, axis=1)
+    negatives_before = negatives_through - negative_weights
+    outranked_negatives = (np.take_along_axis(negatives_before, group_start_ids, axis=1) +
+                           np.take_along_axis(negatives_through, group_end_ids, axis=1)) / 2
+
+    positives_weight = positive_weights.sum(axis=1)
+    negatives_weight = negative_weights.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        auc = (positive_weights * outranked_negatives).sum(axis=1) / (positives_weight * negatives_weight)
+    return np.where((positives_weight > 0) & (negatives_weight > 0), auc, np.nan)
+
+
+def _regression_metrics(target: np.ndarray, predicted: np.ndarray, weights: np.ndarray) -> Dict[str, np.ndarray]:
+    total_weights = weights.sum(axis=1)
+    residual_sum = (weights * (target - predicted) ** 2).sum(axis=1)
+    target_mean = (weights * target).sum(axis=1) / total_weights
+    total_sum = (weights * (target - target_mean[:, np.newaxis]) ** 2).sum(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r2 = 1 - residual_sum / total_sum
+    # the same convention as sklearn for the constant target
+    r2 = np.where(total_sum == 0, np.where(residual_sum == 0, 1.0, 0.0), r2)
+    return {'mse': residual_sum / total_weights, 'r2': r2}
+
+
+def _label_metrics(target: np.ndarray, labels: np.ndarray, weights: np.ndarray,
+                   binary_only: bool = True, pos_label=1) -> Dict[str, np.ndarray]:
+    classes = np.unique(np.concatenate([target.ravel(), labels.ravel()]))
+    classes_num = len(classes)
+    pos_id = _class_id(classes, pos_label)
+    if binary_only:
+        # f1 and precision with the default average='binary' of sklearn
+        if classes_num > 2:
+            raise ValueError("Target is multiclass but average='binary'. Please choose another average setting, "
+                             "one of [None, 'micro', 'macro', 'weighted'].")
+        if pos_id is None and classes_num == 2:
+            raise ValueError(f'pos_label={pos_label} is not a valid label. It should be one of {classes}')
+
+    pair_ids = np.searchsorted(classes, target) * classes_num + np.searchsorted(classes, labels)
+    pair_ids, weights = np.broadcast_arrays(pair_ids, weights)
+    rows_num = pair_ids.shape[0]
+
+    # confusion matrix per row: [row, true class, predicted class]
+    flat_ids = np.arange(rows_num)[:, np.newaxis] * classes_num * classes_num + pair_ids
+    confusion = np.bincount(flat_ids.ravel(), weights=weights.ravel(),
+                            minlength=rows_num * classes_num * classes_num)
+    confusion = confusion.reshape(rows_num, classes_num, classes_num)
+
+    true_positives_by_class = np.diagonal(confusion, axis1=1, axis2=2)
+    support = confusion.sum(axis=2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        recall_by_class = np.where(support > 0, true_positives_by_class / support, np.nan)
+        balanced_accuracy = np.nanmean(recall_by_class, axis=1)
+    accuracy = true_positives_by_class.sum(axis=1) / support.sum(axis=1)
+
+    if pos_id is None:
+        true_positives = false_positives = false_negatives = np.zeros(rows_num)
+    else:
+        true_positives = confusion[:, pos_id, pos_id]
+        false_positives = confusion[:, :, pos_id].sum(axis=1) - true_positives
+        false_negatives = confusion[:, pos_id, :].sum(axis=1) - true_positives
+    # zero is returned for the zero division as sklearn does
+    f1 = _safe_ratio(2 * true_positives, 2 * true_positives + false_positives + false_negatives)
+    precision = _safe_ratio(true_positives, true_positives + false_positives)
+
+    return {'f1': f1, 'accuracy': accuracy, 'precision': precision, 'balanced_accuracy': balanced_accuracy}
+
+
+def _class_id(classes: np.ndarray, label) -> Optional[int]:
+    # the classes may be the strings, so the label is compared with the python values
+    try:
+        return classes.tolist().index(label)
+    except ValueError:
+        return None
+
+
+def _safe_ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator > 0)
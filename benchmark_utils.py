@@ -6,8 +6,14 @@ from pathlib import Path
 from typing import Tuple
 
 import pandas as pd
-from fedot.core.utils import save_file_to_csv, split_data
+from fedot.core.utils import save_file_to_csv
 from pmlb import fetch_data
+from sklearn.model_selection import train_test_split
+
+from artifact_store import ArtifactStore
+from dataset_store import DatasetStore, frame_hash
+
+ARTIFACTS_MAX_SIZE_MB = 20 * 1024
 
 
 def project_root() -> Path:
@@ -18,10 +24,8 @@ def project_root() -> Path:
 def ensure_directory_exists(dir_names: list):
     main_dir = os.path.join(str(project_root()), dir_names[0], dir_names[1])
     dataset_dir = os.path.join(str(project_root()), dir_names[0], dir_names[1], dir_names[2])
-    if not os.path.exists(main_dir):
-        os.mkdir(main_dir)
-    if not os.path.exists(dataset_dir):
-        os.mkdir(dataset_dir)
+    os.makedirs(main_dir, exist_ok=True)
+    os.makedirs(dataset_dir, exist_ok=True)
 
 
 def get_split_data_paths(directory_names: list):
@@ -50,17 +54,49 @@ def get_cancer_case_data_paths() -> Tuple[str, str]:
     return full_train_file_path, full_test_file_path
 
 
-def get_penn_case_data_paths(name_of_dataset: str) -> Tuple[str, str]:
-    df = fetch_data(name_of_dataset)
-    directory_names = ['test_cases', 'penn_ml', 'data', name_of_dataset]
-    penn_train, penn_test = split_data(df, 0.5)
-    ensure_directory_exists(directory_names)
-    full_train_file_path, full_test_file_path = get_split_data_paths(directory_names)
-    save_file_to_csv(penn_train, full_train_file_path)
-    save_file_to_csv(penn_test, full_test_file_path)
+def penn_dataset_store() -> DatasetStore:
+    return DatasetStore(os.path.join(str(project_root()), 'test_cases', 'penn_ml', 'data'))
+
+
+def models_artifact_store() -> ArtifactStore:
+    return ArtifactStore(os.path.join(str(project_root()), 'artifacts'), max_size_mb=ARTIFACTS_MAX_SIZE_MB)
+
+
+def get_penn_case_data(name_of_dataset: str, split_ratio: float = 0.5,
+                       seed: int = 42) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    store = penn_dataset_store()
+    split = store.load(name_of_dataset, split_ratio, seed)
+    if split is None:
+        df = fetch_data(name_of_dataset)
+        # the same split as fedot.core.utils.split_data for the default seed
+        penn_train, penn_test = train_test_split(df, test_size=split_ratio, random_state=seed)
+        store.save(name_of_dataset, split_ratio, seed, penn_train, penn_test, source_hash=frame_hash(df))
+        split = penn_train, penn_test
+    return split
+
+
+def get_penn_case_data_paths(name_of_dataset: str, split_ratio: float = 0.5, seed: int = 42) -> Tuple[str, str]:
+    entry_dir = penn_dataset_store().entry_dir(name_of_dataset, split_ratio, seed)
+    full_train_file_path = os.path.join(entry_dir, 'train.csv')
+    full_test_file_path = os.path.join(entry_dir, 'test.csv')
+    if os.path.exists(full_train_file_path) and os.path.exists(full_test_file_path) and \
+            os.path.exists(os.path.join(entry_dir, 'meta.json')):
+        return full_train_file_path, full_test_file_path
+
+    penn_train, penn_test = get_penn_case_data(name_of_dataset, split_ratio, seed)
+    _save_file_to_csv_atomically(penn_train, full_train_file_path)
+    _save_file_to_csv_atomically(penn_test, full_test_file_path)
     return full_train_file_path, full_test_file_path
 
 
+def _save_file_to_csv_atomically(df: pd.DataFrame, path_to_save: str):
+    # the same dataset can be prepared by several workers of the queue at once,
+    # so the readers should never see the partially written file
+    temp_path = f'{path_to_save}.{os.getpid()}.tmp'
+    save_file_to_csv(df, temp_path)
+    os.replace(temp_path, path_to_save)
+
+
 def convert_json_stats_to_csv(dataset: list, include_hyper: bool = True):
     list_of_df = []
     new_col = []
@@ -105,7 +141,9 @@ def get_models_hyperparameters(timedelta: int = 30) -> dict:
                     }
 
     h2o_config = {'MAX_MODELS': 20,
-                  'MAX_RUNTIME_SECS': timedelta * 60}
+                  'MAX_RUNTIME_SECS': timedelta * 60,
+                  'NTHREADS': -1,
+                  'MAX_MEM_SIZE': '8G'}
 
     autokeras_config = {'MAX_TRIAL': 10,
                         'EPOCH': 100}
@@ -0,0 +1,328 @@
+import hashlib
+import json
+import mmap
+import os
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from fedot.core.data.data import InputData
+from fedot.core.repository.dataset_types import DataTypesEnum
+from fedot.core.repository.tasks import Task, TaskTypesEnum
+
+_META_FILE_NAME = 'meta.json'
+_ARRAYS_FORMAT_VERSION = 1
+
+
+def file_hash(file_path: str) -> str:
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def frame_hash(df: pd.DataFrame) -> str:
+    content = pd.util.hash_pandas_object(df, index=True).values
+    columns = json.dumps([str(column) for column in df.columns])
+    return hashlib.sha256(content.tobytes() + columns.encode()).hexdigest()
+
+
+def arrays_hash(*arrays: np.ndarray) -> str:
+    sha = hashlib.sha256()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        sha.update(f'{array.dtype.str}{array.shape}'.encode())
+        sha.update(array.data)
+    return sha.hexdigest()
+
+
+def input_data_hash(data: InputData) -> str:
+    return arrays_hash(data.features, data.target)
+
+
+def save_frame_columns(df: pd.DataFrame, file_path: str):
+    """ Saves the dataframe as the set of binary column arrays (one per column) """
+    columns = {'index': _to_plain_array(df.index)}
+    for column_id, column_name in enumerate(df.columns):
+        columns[f'column_{column_id}'] = _to_plain_array(df[column_name])
+    temp_path = f'{file_path}.{os.getpid()}.tmp.npz'
+    np.savez(temp_path, **columns)
+    os.replace(temp_path, file_path)
+
+
+def _to_plain_array(values) -> np.ndarray:
+    values = np.asarray(values)
+    if values.dtype.kind == 'O':
+        # the object arrays can not be loaded without pickle
+        values = values.astype(str)
+    return values
+
+
+def load_frame_columns(file_path: str, column_names: list) -> pd.DataFrame:
+    with np.load(file_path, allow_pickle=False) as columns:
+        data = {column_name: columns[f'column_{column_id}'] for column_id, column_name in enumerate(column_names)}
+        return pd.DataFrame(data, index=columns['index'])
+
+
+class DatasetStore:
+    """
+    Local store of the train/test splits of the datasets.
+    The entry is identified by the dataset name, the split ratio and the seed and
+    is valid while the hashes of its files correspond to the saved metadata.
+
+    :param root_dir: directory to keep the entries in
+    """
+
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+
+    def entry_dir(self, name_of_dataset: str, split_ratio: float, seed: int) -> str:
+        return os.path.join(self.root_dir, name_of_dataset, f'split_{split_ratio}_seed_{seed}')
+
+    def load(self, name_of_dataset: str, split_ratio: float,
+             seed: int) -> Optional[Tuple[pd.DataFrame, pd.DataFrame]]:
+        entry_dir = self.entry_dir(name_of_dataset, split_ratio, seed)
+        meta = self._valid_meta(entry_dir)
+        if meta is None:
+            return None
+        train = load_frame_columns(os.path.join(entry_dir, 'train.npz'), meta['columns'])
+        test = load_frame_columns(os.path.join(entry_dir, 'test.npz'), meta['columns'])
+        return train, test
+
+    def save(self, name_of_dataset: str, split_ratio: float, seed: int,
+             train: pd.DataFrame, test: pd.DataFrame, source_hash: str):
+        entry_dir = self.entry_dir(name_of_dataset, split_ratio, seed)
+        os.makedirs(entry_dir, exist_ok=True)
+        meta = {'name_of_dataset': name_of_dataset,
+                'split_ratio': split_ratio,
+                'seed': seed,
+                'source_hash': source_hash,
+                'columns': [str(column) for column in train.columns],
+                'files': {}}
+        for split_name, split in [('train', train), ('test', test)]:
+            file_path = os.path.join(entry_dir, f'{split_name}.npz')
+            save_frame_columns(split, file_path)
+            meta['files'][f'{split_name}.npz'] = file_hash(file_path)
+
+        # the metadata is written last, so the interrupted save leaves the invalid entry
+        temp_path = os.path.join(entry_dir, f'{_META_FILE_NAME}.{os.getpid()}.tmp')
+        with open(temp_path, 'w') as file:
+            json.dump(meta, file, indent=4)
+        os.replace(temp_path, os.path.join(entry_dir, _META_FILE_NAME))
+
+    @staticmethod
+    def _valid_meta(entry_dir: str) -> Optional[dict]:
+        meta_path = os.path.join(entry_dir, _META_FILE_NAME)
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path, 'r') as file:
+                meta = json.load(file)
+            for file_name, expected_hash in meta['files'].items():
+                if file_hash(os.path.join(entry_dir, file_name)) != expected_hash:
+                    print(f'Dataset store entry {entry_dir} is corrupted')
+                    return None
+        except (OSError, ValueError, KeyError) as ex:
+            print(f'Dataset store entry {entry_dir} is not readable: {ex}')
+            return None
+        return meta
+
+
+def load_input_data(file_path: str, task: Task = Task(TaskTypesEnum.classification)) -> InputData:
+    """
+    Loads the table data as InputData.from_csv does. The CSV file is parsed only once:
+    its idx, features and target are saved to the .npy files next to it and
+    the following loads map these files into memory without parsing and copying.
+
+    :param file_path: the path to the CSV with data (target is the last column)
+    :param task: the task that should be solved with data
+    """
+    arrays_dir = f'{file_path}.arrays'
+    arrays = _load_data_arrays(arrays_dir, file_path)
+    if arrays is None:
+        data = InputData.from_csv(file_path, task=task)
+        _save_data_arrays(arrays_dir, file_path, data)
+        return data
+
+    idx, features, target = arrays
+    return InputData(idx=idx, features=features, target=target, task=task, data_type=DataTypesEnum.table)
+
+
+def _source_stamp(file_path: str) -> dict:
+    stat = os.stat(file_path)
+    return {'format_version': _ARRAYS_FORMAT_VERSION, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _load_data_arrays(arrays_dir: str, file_path: str) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    meta_path = os.path.join(arrays_dir, _META_FILE_NAME)
+    try:
+        with open(meta_path, 'r') as file:
+            meta = json.load(file)
+        if meta != _source_stamp(file_path):
+            return None
+        # copy-on-write mapping: the data is not read until it is used and
+        # the frameworks that modify the arrays in place do not change the files
+        return tuple(np.load(os.path.join(arrays_dir, f'{name}.npy'), mmap_mode='c', allow_pickle=False)
+                     for name in ['idx', 'features', 'target'])
+    except (OSError, ValueError):
+        return None
+
+
+def _save_data_arrays(arrays_dir: str, file_path: str, data: InputData):
+    arrays = {'idx': np.asarray(data.idx), 'features': np.asarray(data.features), 'target': np.asarray(data.target)}
+    if any(array.dtype.kind == 'O' for array in arrays.values()):
+        # the memory mapping is not applicable to the object arrays
+        return
+
+    os.makedirs(arrays_dir, exist_ok=True)
+    for name, array in arrays.items():
+        temp_path = os.path.join(arrays_dir, f'{name}.{os.getpid()}.tmp.npy')
+        np.save(temp_path, np.ascontiguousarray(array))
+        os.replace(temp_path, os.path.join(arrays_dir, f'{name}.npy'))
+
+    temp_path = os.path.join(arrays_dir, f'{_META_FILE_NAME}.{os.getpid()}.tmp')
+    with open(temp_path, 'w') as file:
+        json.dump(_source_stamp(file_path), file)
+    os.replace(temp_path, os.path.join(arrays_dir, _META_FILE_NAME))
+
+
+def _copy_on_write_map(memory: shared_memory.SharedMemory) -> mmap.mmap:
+    if os.name == 'nt':
+        return mmap.mmap(-1, memory.size, tagname=memory.name, access=mmap.ACCESS_COPY)
+    return mmap.mmap(memory._fd, memory.size, access=mmap.ACCESS_COPY)
+
+
+class SharedArray:
+    """
+    Array placed in the shared memory. The pickled object contains only the name of
+    the memory block, so the processes that unpickle it map the same data instead of copying.
+    The unpickled array is the private copy-on-write view (as the arrays loaded with mmap_mode='c'):
+    the process reads the shared pages and the pages changed in place are copied for it only.
+
+    :param array: array to copy to the shared memory
+    """
+
+    def __init__(self, array: np.ndarray):
+        self._memory = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self._is_owner = True
+        self._private_map = None
+        self.array = np.ndarray(array.shape, dtype=array.dtype, buffer=self._memory.buf)
+        self.array[...] = array
+
+    def __getstate__(self):
+        return {'name': self._memory.name, 'shape': self.array.shape, 'dtype': self.array.dtype.str}
+
+    def __setstate__(self, state):
+        # the workers started by multiprocessing share the resource tracker of the creator,
+        # so the block stays registered once and is removed by the creator only
+        self._memory = shared_memory.SharedMemory(name=state['name'])
+        self._is_owner = False
+        # the same memory is used by the other processes, so the frameworks that
+        # modify the arrays in place change only the private copies of the pages
+        self._private_map = _copy_on_write_map(self._memory)
+        self.array = np.ndarray(state['shape'], dtype=np.dtype(state['dtype']), buffer=self._private_map)
+
+    def private_view(self) -> np.ndarray:
+        """ Returns the new copy-on-write view of the shared memory, which changes are not seen by the other views """
+        return np.ndarray(self.array.shape, dtype=self.array.dtype, buffer=_copy_on_write_map(self._memory))
+
+    def release(self):
+        self.array = None
+        if self._private_map is not None:
+            self._private_map.close()
+            self._private_map = None
+        self._memory.close()
+        if self._is_owner:
+            self._memory.unlink()
+
+
+_TABLE_ARRAYS_NAMES = ['idx', 'features', 'target']
+
+
+def _mapped_file(array: np.ndarray) -> Optional[np.memmap]:
+    # the file mapping, which memory is the array (i.e. the contiguous view of np.load with mmap_mode)
+    source = array
+    while isinstance(source, np.ndarray) and not isinstance(source, np.memmap):
+        source = source.base
+    if (isinstance(source, np.memmap) and source.filename is not None and
+            source.shape == array.shape and source.dtype == array.dtype and
+            source.__array_interface__['data'][0] == array.__array_interface__['data'][0]):
+        return source
+    return None
+
+
+def _private_array(array: np.ndarray) -> np.ndarray:
+    """ Returns the copy-on-write view of the file mapping or the copy of the array in memory """
+    source = _mapped_file(array)
+    if source is None:
+        return np.array(array)
+    return np.memmap(source.filename, dtype=source.dtype, mode='c', offset=source.offset, shape=source.shape)
+
+
+class TableData:
+    """
+    Table dataset (idx, features and target as contiguous arrays) loaded once and
+    passed to all the strategies of the case.
+
+    :param idx: the indices of the rows
+    :param features: the features table
+    :param target: the target column
+    """
+
+    def __init__(self, idx: np.ndarray, features: np.ndarray, target: np.ndarray):
+        self.idx = np.ascontiguousarray(idx)
+        self.features = np.ascontiguousarray(features)
+        self.target = np.ascontiguousarray(target)
+        self._shared_arrays = {}
+
+    @staticmethod
+    def from_file(file_path: str) -> 'TableData':
+        data = load_input_data(file_path)
+        return TableData(idx=data.idx, features=data.features, target=data.target)
+
+    def to_input_data(self, task: Task = Task(TaskTypesEnum.classification)) -> InputData:
+        """
+        Returns the data for one strategy. Every call gets its own copy-on-write views of the arrays
+        (the copies for the arrays, which are not mapped), so the framework that modifies the arrays
+        in place does not change the data of the strategies that are run after it
+        """
+        arrays = {name: self._shared_arrays[name].private_view() if name in self._shared_arrays
+                  else _private_array(getattr(self, name)) for name in _TABLE_ARRAYS_NAMES}
+        return InputData(idx=arrays['idx'], features=arrays['features'], target=arrays['target'],
+                         task=task, data_type=DataTypesEnum.table)
+
+    def share(self):
+        """ Moves the arrays to the shared memory before passing the data to the other processes """
+        for name in _TABLE_ARRAYS_NAMES:
+            array = getattr(self, name)
+            if name not in self._shared_arrays and array.dtype.kind != 'O':
+                self._shared_arrays[name] = SharedArray(array)
+                setattr(self, name, self._shared_arrays[name].array)
+
+    def release(self):
+        """ Returns the arrays to the private memory and frees the shared memory """
+        for name, shared_array in self._shared_arrays.items():
+            setattr(self, name, np.array(shared_array.array))
+            shared_array.release()
+        self._shared_arrays = {}
+
+    def __getstate__(self):
+        state = {name: getattr(self, name) for name in _TABLE_ARRAYS_NAMES if name not in self._shared_arrays}
+        state['_shared_arrays'] = self._shared_arrays
+        return state
+
+    def __setstate__(self, state):
+        self._shared_arrays = state.pop('_shared_arrays')
+        for name, shared_array in self._shared_arrays.items():
+            state[name] = shared_array.array
+        self.__dict__.update(state)
+
+
+def case_input_data(params: 'ExecutionParams',
+                    task: Task = Task(TaskTypesEnum.classification)) -> Tuple[InputData, InputData]:
+    """ Returns the train and test data of the case, the files are read only if the data was not passed """
+    if params.train_data is not None and params.test_data is not None:
+        return params.train_data.to_input_data(task), params.test_data.to_input_data(task)
+    return load_input_data(params.train_file, task=task), load_input_data(params.test_file, task=task)
@@ -1,37 +1,36 @@
-from dataclasses import dataclass
-from typing import List
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from multiprocessing import get_context
+from multiprocessing.connection import wait
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
-from sklearn.metrics import f1_score, mean_squared_error, r2_score, roc_auc_score, balanced_accuracy_score
 
 from model.H2O.b_h2o import run_h2o
 from model.autokeras.b_autokeras import run_autokeras
 from baseline.b_xgboost import run_xgboost
+from benchmark_metrics import bootstrap_metrics, compute_metrics
 from benchmark_model_types import BenchmarkModelTypesEnum
+from dataset_store import TableData
 from model.fedot.b_fedot import run_fedot
 from model.tpot.b_tpot import run_tpot
 from fedot.core.repository.tasks import TaskTypesEnum
+from resource_usage import collect_resource_usage
 
 
 def calculate_metrics(metric_list: list, target: list, predicted_probs: list, predicted_labels: list):
-    metric_dict = {'roc_auc': roc_auc_score,
-                   'f1': f1_score,
-                   'mse': mean_squared_error,
-                   'r2': r2_score,
-                   'balanced_accuracy': balanced_accuracy_score
-                   }
-    label_only_metrics = ['f1', 'accuracy', 'precision', 'balanced_accuracy']
-    result_metric = []
-    for metric_name in metric_list:
-        predicted = predicted_probs
-        if metric_name in label_only_metrics:
-            predicted = predicted_labels
+    metrics = compute_metrics(metric_list, target, predicted_probs=predicted_probs, predicted_labels=predicted_labels)
+    return {metric_name: round(metric_value, 3) for metric_name, metric_value in metrics.items()}
 
-        result_metric.append(round(metric_dict[metric_name](target, predicted), 3))
 
-    result_dict = dict(zip(metric_list, result_metric))
-
-    return result_dict
+def calculate_metrics_intervals(metric_list: list, target: list, predicted_probs: list, predicted_labels: list,
+                                samples_num: int):
+    intervals = bootstrap_metrics(metric_list, target, predicted_probs=predicted_probs,
+                                  predicted_labels=predicted_labels, samples_num=samples_num)
+    return {metric_name: {bound_name: round(bound, 3) for bound_name, bound in bounds.items()}
+            for metric_name, bounds in intervals.items()}
 
 
 @dataclass
@@ -41,6 +40,9 @@ class ExecutionParams:
     case_label: str
     target_name: str
     task: TaskTypesEnum
+    n_jobs: Optional[int] = None
+    train_data: Optional[TableData] = None
+    test_data: Optional[TableData] = None
 
 
 @dataclass
@@ -48,6 +50,11 @@ class CaseExecutor:
     models: List[BenchmarkModelTypesEnum]
     metric_list: List[str]
     params: ExecutionParams
+    parallel: bool = False
+    cores_by_model: Optional[Dict[BenchmarkModelTypesEnum, int]] = None
+    bootstrap_samples: int = 0
+    # the frameworks search for 30 minutes by default, so the worker that runs longer is considered hung
+    worker_timeout_secs: Optional[float] = 3 * 60 * 60
 
     _strategy_by_type = {
         BenchmarkModelTypesEnum.tpot: run_tpot,
@@ -65,12 +72,175 @@ class CaseExecutor:
         strategies = {model_type: self._strategy_by_type[model_type] for
                       model_type in self.models}
 
-        for model_type, strategy_func in strategies.items():
-            print(f'---------\nRUN {model_type.name}\n---------')
-            target, predicted, predicted_labels = strategy_func(self.params)
-            result[f'{model_type.name}_metric'] = calculate_metrics(self.metric_list,
-                                                                    target=target,
-                                                                    predicted_probs=predicted,
-                                                                    predicted_labels=predicted_labels)
+        # the data is parsed once and passed to all the strategies
+        params = self.params
+        if params.train_data is None or params.test_data is None:
+            with collect_resource_usage() as load_usage:
+                params = replace(params,
+                                 train_data=TableData.from_file(params.train_file),
+                                 test_data=TableData.from_file(params.test_file))
+            result['data_load_resources'] = load_usage
+
+        if self.parallel:
+            model_results = self._execute_parallel(list(strategies.keys()), params)
+        else:
+            model_results = self._execute_sequential(strategies, params)
+
+        for model_type, model_metrics, metrics_intervals, usage, error in model_results:
+            if error:
+                print(f'Exception on {model_type.name}: {error}')
+                model_metrics = {'error': error}
+            result[f'{model_type.name}_metric'] = model_metrics
+            if metrics_intervals:
+                result[f'{model_type.name}_metric_ci'] = metrics_intervals
+            result[f'{model_type.name}_resources'] = usage
 
         return result
+
+    def _execute_sequential(self, strategies: dict, params: ExecutionParams):
+        for model_type, strategy_func in strategies.items():
+            print(f'---------\nRUN {model_type.name}\n---------')
+            # the failed framework does not stop the next ones as in the parallel mode
+            try:
+                yield (model_type, *_run_strategy(strategy_func, params, self.metric_list, self.bootstrap_samples),
+                       None)
+            except Exception as ex:
+                yield model_type, None, None, None, f'{type(ex).__name__}: {ex}'
+
+    def _execute_parallel(self, model_types: List[BenchmarkModelTypesEnum], params: ExecutionParams):
+        # the workers map the data from the shared memory instead of receiving its copies
+        params.train_data.share()
+        params.test_data.share()
+        try:
+            yield from self._execute_in_processes(model_types, params)
+        finally:
+            params.train_data.release()
+            params.test_data.release()
+
+    def _execute_in_processes(self, model_types: List[BenchmarkModelTypesEnum], params: ExecutionParams):
+        # every framework gets its own spawned process, so a crashed JVM or
+        # an exhausted GPU in one of them does not affect the others
+        context = get_context('spawn')
+        connections = {}
+        processes = {}
+        for model_type, cpu_ids in self._cpu_ids_by_model(model_types).items():
+            print(f'---------\nRUN {model_type.name} ON {len(cpu_ids)} CORES\n---------')
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=_strategy_worker,
+                                      args=(model_type, replace(params, n_jobs=len(cpu_ids)),
+                                            self.metric_list, self.bootstrap_samples, cpu_ids, sender),
+                                      name=f'benchmark_{model_type.name}')
+            with _threads_limit(len(cpu_ids)):
+                process.start()
+            sender.close()
+            connections[receiver] = model_type
+            processes[model_type] = process
+
+        deadline = None if self.worker_timeout_secs is None else time.monotonic() + self.worker_timeout_secs
+        while connections:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            ready_receivers = wait(list(connections.keys()), timeout=timeout)
+            if not ready_receivers:
+                # the hung frameworks are stopped, so the results of the others are not lost
+                for receiver, model_type in list(connections.items()):
+                    connections.pop(receiver)
+                    receiver.close()
+                    _stop_worker(processes[model_type])
+                    yield (model_type, None, None, None,
+                           f'worker process timed out after {self.worker_timeout_secs} secs')
+                break
+            for receiver in ready_receivers:
+                model_type = connections.pop(receiver)
+                try:
+                    model_metrics, metrics_intervals, usage, error = receiver.recv()
+                except EOFError:
+                    model_metrics, metrics_intervals, usage, error = \
+                        None, None, None, 'worker process terminated unexpectedly'
+                receiver.close()
+                yield model_type, model_metrics, metrics_intervals, usage, error
+
+        for process in processes.values():
+            # the worker has sent the result, only its cleanup (i.e. the shutdown of h2o) may hang
+            process.join(timeout=_WORKER_EXIT_TIMEOUT_SECS)
+            _stop_worker(process)
+
+    def _cpu_ids_by_model(self, model_types: List[BenchmarkModelTypesEnum]) -> Dict[BenchmarkModelTypesEnum, list]:
+        if hasattr(os, 'sched_getaffinity'):
+            available_cpu_ids = sorted(os.sched_getaffinity(0))
+        else:
+            available_cpu_ids = list(range(os.cpu_count()))
+        cores_by_model = self.cores_by_model or {}
+        default_cores = max(1, len(available_cpu_ids) // len(model_types))
+
+        cpu_ids_by_model = {}
+        offset = 0
+        for model_type in model_types:
+            cores = min(cores_by_model.get(model_type, default_cores), len(available_cpu_ids))
+            # the budget wraps around if the requested cores exceed the machine
+            cpu_ids_by_model[model_type] = [available_cpu_ids[(offset + core) % len(available_cpu_ids)]
+                                            for core in range(cores)]
+            offset += cores
+        return cpu_ids_by_model
+
+
+_WORKER_EXIT_TIMEOUT_SECS = 60
+
+
+def _stop_worker(process):
+    if process.is_alive():
+        process.terminate()
+        process.join(timeout=_WORKER_EXIT_TIMEOUT_SECS)
+    if process.is_alive():
+        process.kill()
+        process.join()
+
+
+_THREADS_LIMIT_VARIABLES = ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                            'NUMEXPR_NUM_THREADS', 'TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS']
+
+
+@contextmanager
+def _threads_limit(threads_num: int):
+    # spawned processes inherit the environment on start, so the limits
+    # are applied before numpy or tensorflow create their thread pools
+    initial_values = {variable: os.environ.get(variable) for variable in _THREADS_LIMIT_VARIABLES}
+    os.environ.update({variable: str(threads_num) for variable in _THREADS_LIMIT_VARIABLES})
+    try:
+        yield
+    finally:
+        for variable, value in initial_values.items():
+            if value is None:
+                os.environ.pop(variable, None)
+            else:
+                os.environ[variable] = value
+
+
+def _run_strategy(strategy_func, params: ExecutionParams, metric_list: List[str],
+                  bootstrap_samples: int = 0) -> Tuple[dict, Optional[dict], dict]:
+    with collect_resource_usage() as usage:
+        target, predicted, predicted_labels = strategy_func(params)
+    model_metrics = calculate_metrics(metric_list,
+                                      target=target,
+                                      predicted_probs=predicted,
+                                      predicted_labels=predicted_labels)
+    metrics_intervals = None
+    if bootstrap_samples > 0:
+        metrics_intervals = calculate_metrics_intervals(metric_list,
+                                                        target=target,
+                                                        predicted_probs=predicted,
+                                                        predicted_labels=predicted_labels,
+                                                        samples_num=bootstrap_samples)
+    return model_metrics, metrics_intervals, usage
+
+
+def _strategy_worker(model_type: BenchmarkModelTypesEnum, params: ExecutionParams, metric_list: List[str],
+                     bootstrap_samples: int, cpu_ids: List[int], connection):
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpu_ids)
+    try:
+        strategy_func = CaseExecutor._strategy_by_type[model_type]
+        connection.send((*_run_strategy(strategy_func, params, metric_list, bootstrap_samples), None))
+    except Exception as ex:
+        connection.send((None, None, None, f'{type(ex).__name__}: {ex}'))
+    finally:
+        connection.close()
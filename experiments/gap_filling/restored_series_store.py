@@ -0,0 +1,119 @@
+import os
+import zipfile
+from typing import Dict, List
+
+import numpy as np
+
+# Suffix of the array with the size and the modification time of the source file
+SOURCE_SUFFIX = '.source'
+
+
+class RestoredSeriesStore:
+    """
+    Store of the time series restored by the gap-filling methods. The series
+    of every data file are kept in one npz archive with the array per method,
+    so the new method is appended as one array and only the requested arrays
+    are read. The series imported from the file (i.e. the csv file written by
+    the gap-filling script) is kept with the size and the modification time
+    of the file, so the rewritten file is imported again
+
+    :param root_dir: directory with the archives
+    """
+
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+
+    def archive_path(self, file_name: str) -> str:
+        """
+        :param file_name: name of the data file (i.e. 'Sea_hour.csv')
+        :return: path to the archive with the restored series of the file
+        """
+
+        return os.path.join(self.root_dir, f'{os.path.splitext(file_name)[0]}.npz')
+
+    def methods(self, file_name: str) -> List[str]:
+        """
+        :param file_name: name of the data file
+        :return: names of the methods with the restored series in the store
+        """
+
+        archive_path = self.archive_path(file_name)
+        if not os.path.exists(archive_path):
+            return []
+        with zipfile.ZipFile(archive_path) as archive:
+            names = [os.path.splitext(name)[0] for name in archive.namelist()]
+        return [name for name in names if not name.endswith(SOURCE_SUFFIX)]
+
+    def is_current(self, file_name: str, method: str, source_path: str) -> bool:
+        """
+        :param file_name: name of the data file
+        :param method: name of the method
+        :param source_path: path to the file, which the series was imported from
+        :return: True if the series of the method is stored and the file was
+        not changed after the import
+        """
+
+        archive_path = self.archive_path(file_name)
+        if not os.path.exists(archive_path) or not os.path.exists(source_path):
+            return False
+        with np.load(archive_path) as archive:
+            if f'{method}{SOURCE_SUFFIX}' not in archive.files:
+                return False
+            return np.array_equal(archive[f'{method}{SOURCE_SUFFIX}'], self._source_stamp(source_path))
+
+    def load(self, file_name: str, methods: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Method reads the restored series of the methods
+
+        :param file_name: name of the data file
+        :param methods: names of the methods to read
+        :return: dict with the restored series for every method
+        """
+
+        with np.load(self.archive_path(file_name)) as archive:
+            # The arrays of the npz archive are read on access
+            return {method: archive[method] for method in methods}
+
+    def append(self, file_name: str, method: str, series: np.ndarray,
+               source_path: str = None):
+        """
+        Method appends the restored series of the method to the archive of
+        the file, the existing series of the method is replaced
+
+        :param file_name: name of the data file
+        :param method: name of the method
+        :param series: restored time series
+        :param source_path: path to the file with the series, its size and
+        modification time are stored for is_current
+        """
+
+        os.makedirs(self.root_dir, exist_ok=True)
+        archive_path = self.archive_path(file_name)
+        if os.path.exists(archive_path):
+            self._remove(archive_path, [f'{method}.npy', f'{method}{SOURCE_SUFFIX}.npy'])
+
+        arrays = {method: np.asarray(series, dtype=float)}
+        if source_path is not None:
+            arrays[f'{method}{SOURCE_SUFFIX}'] = self._source_stamp(source_path)
+        with zipfile.ZipFile(archive_path, mode='a') as archive:
+            for name, array in arrays.items():
+                with archive.open(f'{name}.npy', mode='w', force_zip64=True) as array_file:
+                    np.lib.format.write_array(array_file, array)
+
+    @staticmethod
+    def _source_stamp(source_path: str) -> np.ndarray:
+        source_stat = os.stat(source_path)
+        return np.array([source_stat.st_size, source_stat.st_mtime_ns], dtype=np.int64)
+
+    @staticmethod
+    def _remove(archive_path: str, member_names: List[str]):
+        with zipfile.ZipFile(archive_path) as archive:
+            if not set(member_names) & set(archive.namelist()):
+                return
+        # The zip archive can not delete the member, so the other ones are copied
+        temp_path = f'{archive_path}.tmp'
+        with zipfile.ZipFile(archive_path) as archive, zipfile.ZipFile(temp_path, mode='w') as new_archive:
+            for name in archive.namelist():
+                if name not in member_names:
+                    new_archive.writestr(archive.getinfo(name), archive.read(name))
+        os.replace(temp_path, archive_path)
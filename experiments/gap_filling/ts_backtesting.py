@@ -0,0 +1,189 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from copy import deepcopy
+from multiprocessing import get_context
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+from fedot.core.chains.node import PrimaryNode
+from fedot.core.chains.ts_chain import TsForecastingChain
+
+from ts_gapfilling import accepts_lagged_table, chain_forecast, fit_chain
+from ts_metrics import METRICS, error_metrics
+
+# The time series of the backtest in the worker process
+_worker_series = None
+
+
+def rolling_origins(series_length: int, forecast_length: int, n_origins: int,
+                    step: int = None) -> List[int]:
+    """
+    Function returns the last cut points of the time series, so the forecast
+    from the last one ends at the end of the series
+
+    :param series_length: length of the time series
+    :param forecast_length: number of the forecasted elements
+    :param n_origins: number of the cut points
+    :param step: distance between the cut points (forecast_length by default,
+    so the forecasted parts do not intersect)
+    :return: ascending indices of the first forecasted elements
+    """
+
+    step = forecast_length if step is None else step
+    last_origin = series_length - forecast_length
+    return [last_origin - step * i for i in reversed(range(n_origins))]
+
+
+def aggregate_metrics(per_origin: pd.DataFrame) -> pd.DataFrame:
+    """
+    :param per_origin: table with the metrics for every cut point
+    :return: mean, standard deviation, median and max of the metrics over
+    the cut points
+    """
+
+    return per_origin[METRICS].agg(['mean', 'std', 'median', 'max'])
+
+
+def _set_worker_series(series: np.ndarray):
+    global _worker_series
+    _worker_series = series
+
+
+class RollingOriginBacktest:
+    """
+    Class used for the rolling-origin evaluation of the chain for the time
+    series forecasting. The chain is fitted on the elements before every cut
+    point (origin) and forecasts the forecast_length elements after it.
+
+    The chain, which takes the lagged table, is fitted on the strided views
+    of the series (see ts_gapfilling.fit_chain with strided_windows), so the
+    lagged table is not built for every origin. Other chains (composite ones
+    or with the models for the time series only) build the lagged table by
+    themselves at every origin, see reuses_windows
+
+    :param chain: TsForecastingChain to evaluate
+    :param forecast_length: number of the forecasted elements
+    :param max_window_size: number of the lagged elements
+    :param n_jobs: number of the processes for the origins (None for all
+    the cores, 1 for the current process)
+    :param strided_windows: if False, the chain is fitted as
+    TsForecastingChain.fit does at every origin
+    """
+
+    def __init__(self, chain: TsForecastingChain, forecast_length: int,
+                 max_window_size: int, n_jobs: int = None,
+                 strided_windows: bool = True):
+        self.chain = chain
+        self.forecast_length = forecast_length
+        self.max_window_size = max_window_size
+        self.n_jobs = n_jobs
+        self.strided_windows = strided_windows
+
+    def reuses_windows(self, origins: List[int]) -> bool:
+        """
+        :param origins: indices of the first forecasted elements
+        :return: True if the chain is fitted on the views of the lagged table
+        of the series at every origin (FEDOT builds the table by itself for the
+        part with less rows than max_window_size)
+        """
+
+        min_rows = min(origins) - self.max_window_size - self.forecast_length + 1
+        return (self.strided_windows and accepts_lagged_table(self.chain) and
+                min_rows >= self.max_window_size)
+
+    def run(self, series: np.ndarray, origins: List[int],
+            actual: np.ndarray = None) -> pd.DataFrame:
+        """
+        Method fits the chain and makes the forecast for every origin
+
+        :param series: one-dimensional time series without gaps
+        :param origins: indices of the first forecasted elements
+        :param actual: time series to compare the forecasts with (i.e. the
+        original series for the restored one), the series by default
+        :return: table with the metrics and the runtime for every origin
+        """
+
+        series = np.ascontiguousarray(series, dtype=float)
+        actual = series if actual is None else np.asarray(actual, dtype=float)
+        min_origin = self.max_window_size + self.forecast_length
+        for origin in origins:
+            if not min_origin <= origin <= len(series) - self.forecast_length:
+                raise ValueError(f'Origin {origin} leaves less than {min_origin} elements '
+                                 f'before it or {self.forecast_length} after it')
+
+        if self.n_jobs == 1:
+            _set_worker_series(series)
+            try:
+                results = [self._origin_forecast(origin) for origin in origins]
+            finally:
+                _set_worker_series(None)
+        else:
+            # The series is sent to every worker once, the jobs get only the origins
+            with ProcessPoolExecutor(max_workers=self.n_jobs, mp_context=get_context('spawn'),
+                                     initializer=_set_worker_series,
+                                     initargs=(series,)) as executor:
+                futures = [executor.submit(self._origin_forecast, origin) for origin in origins]
+                results = [future.result() for future in futures]
+
+        # The metrics of all the origins are calculated at once, a row per origin
+        predicted = np.stack([predicted for predicted, _ in results])
+        actual_parts = np.stack([actual[origin:origin + self.forecast_length] for origin in origins])
+        return pd.DataFrame({'Origin': origins,
+                             **error_metrics(actual_parts, predicted),
+                             'Runtime': [runtime for _, runtime in results]})
+
+    def _origin_forecast(self, origin: int) -> Tuple[np.ndarray, float]:
+        """
+        Method fits the copy of the chain on the elements before the origin
+
+        :param origin: index of the first forecasted element
+        :return: forecasted values and the runtime of fit and forecast
+        """
+
+        start = time.perf_counter()
+        # The part before the origin is the view of the series, so its lagged
+        # table is the first rows of the lagged table of the whole series
+        train_part = _worker_series[:origin]
+        chain = fit_chain(deepcopy(self.chain), train_part, self.forecast_length,
+                          self.max_window_size, strided_windows=self.strided_windows)
+        predicted = chain_forecast(chain, train_part, self.forecast_length,
+                                   self.forecast_length, self.max_window_size,
+                                   strided_windows=self.strided_windows)
+        return np.ravel(predicted), time.perf_counter() - start
+
+
+folder_to_save = './iccs_article/backtesting'
+
+if __name__ == '__main__':
+    from forecasting import RESTORED_VARIANTS, load_restored_variants
+
+    # Оценка прогноза на восстановленных рядах по нескольким точкам разбиения
+    prediction_len = 400
+    max_window_size = 500
+    results = []
+    for file_name in ['Synthetic.csv', 'Sea_hour.csv', 'Sea_10_240.csv']:
+        _, restored = load_restored_variants('./iccs_article', file_name)
+        for model, _ in RESTORED_VARIANTS:
+            series = restored[model]
+            origins = rolling_origins(len(series), prediction_len, n_origins=5)
+            # Цепочка из одного узла с ridge обучается на представлениях матрицы лагов ряда
+            backtest = RollingOriginBacktest(TsForecastingChain(PrimaryNode('ridge')),
+                                             prediction_len, max_window_size)
+            if not backtest.reuses_windows(origins):
+                raise ValueError(f'The lagged table of {file_name} is built at every origin')
+            per_origin = backtest.run(series, origins, actual=restored['Original'])
+            per_origin.insert(0, 'Model', model)
+            per_origin.insert(0, 'File', file_name)
+            results.append(per_origin)
+
+            print(file_name, model)
+            print(aggregate_metrics(per_origin).round(4).to_string(), '\n')
+
+    # Create folder if it doesnt exists
+    if os.path.isdir(folder_to_save) == False:
+        os.makedirs(folder_to_save)
+    results = pd.concat(results, ignore_index=True)
+    results.to_csv(os.path.join(folder_to_save, 'per_origin.csv'), index=False)
+    results.groupby(['File', 'Model'])[METRICS].mean().to_csv(os.path.join(folder_to_save, 'aggregated.csv'))
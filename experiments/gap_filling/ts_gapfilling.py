@@ -0,0 +1,1128 @@
+import hashlib
+import os
+from copy import deepcopy
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Iterator, Optional, Tuple, Union
+
+import numpy as np
+from fedot.core.chains.node import PrimaryNode
+from fedot.core.data.data import InputData
+from fedot.core.repository.dataset_types import DataTypesEnum
+from fedot.core.repository.tasks import Task, TaskTypesEnum, TsForecastingParams
+
+from ts_metrics import error_metrics
+
+
+def gap_mask_batch(series: np.ndarray, gap_value: Union[float, np.ndarray] = -100.0) -> np.ndarray:
+    """
+    Function finds the gap elements in the batch of time series
+
+    :param series: array with the time series in rows (or one-dimensional array)
+    :param gap_value: value, which identify gap elements, or array with
+    such value for every series
+    :return: boolean array with True for the gaps and NaN values
+    """
+
+    series = np.asarray(series, dtype=float)
+    gap_value = np.asarray(gap_value, dtype=float)
+    if series.ndim == 2 and gap_value.ndim == 1:
+        gap_value = gap_value[:, np.newaxis]
+    return (series == gap_value) | np.isnan(series)
+
+
+def linear_interpolation_batch(series: np.ndarray, gap_mask: np.ndarray = None,
+                               gap_value: Union[float, np.ndarray] = -100.0) -> np.ndarray:
+    """
+    Function restores missing values in the batch of time series using
+    linear interpolation between the nearest known elements. The nearest
+    known elements are found for all the series at once with running
+    maximum and minimum of their indices, so there is no loop over the series.
+    The gaps at the edges of the series take the value of the nearest known
+    element as np.interp does
+
+    :param series: array with the time series in rows (or one-dimensional array)
+    :param gap_mask: boolean array with True for the gaps, if None it is
+    calculated with gap_value
+    :param gap_value: value, which identify gap elements, or array with
+    such value for every series
+    :return: array without gaps (the series without known elements are filled with NaN)
+    """
+
+    series = np.asarray(series, dtype=float)
+    is_one_series = series.ndim == 1
+    if gap_mask is None:
+        gap_mask = gap_mask_batch(series, gap_value)
+    series = np.atleast_2d(series)
+    is_known = ~np.atleast_2d(gap_mask)
+    series_len = series.shape[1]
+
+    # For every element - the indices of the nearest known elements on the left and on the right
+    ids = np.arange(series_len)
+    left_ids = np.maximum.accumulate(np.where(is_known, ids, -1), axis=1)
+    right_ids = np.minimum.accumulate(np.where(is_known, ids, series_len)[:, ::-1], axis=1)[:, ::-1]
+    left_ids = np.where(left_ids < 0, right_ids, left_ids)
+    right_ids = np.where(right_ids >= series_len, left_ids, right_ids)
+
+    has_known = is_known.any(axis=1, keepdims=True)
+    left_ids = np.where(has_known, left_ids, 0)
+    right_ids = np.where(has_known, right_ids, 0)
+    left_values = np.take_along_axis(series, left_ids, axis=1)
+    right_values = np.take_along_axis(series, right_ids, axis=1)
+
+    span = right_ids - left_ids
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(span > 0, (right_values - left_values) / span, 0.0)
+    output_data = left_values + slope * (ids - left_ids)
+    output_data = np.where(has_known, output_data, np.nan)
+
+    if is_one_series:
+        return output_data[0]
+    return output_data
+
+
+def find_gap_runs(gap_mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Function finds the continuous intervals (runs) of gaps in the series
+
+    :param gap_mask: boolean array with True for the gap elements
+    :return: arrays with the first indices and the lengths of the runs
+    """
+
+    edges = np.diff(np.concatenate(([0], np.asarray(gap_mask, dtype=np.int8), [0])))
+    run_starts = np.flatnonzero(edges == 1)
+    return run_starts, np.flatnonzero(edges == -1) - run_starts
+
+
+def parse_gap_ids(gap_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Function splits the sorted indices of gaps into the continuous intervals
+
+    :param gap_ids: sorted array with indices of gaps
+    :return: arrays with the first indices and the lengths of the intervals
+    """
+
+    gap_ids = np.asarray(gap_ids, dtype=int)
+    if len(gap_ids) == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    run_positions = np.flatnonzero(np.diff(gap_ids, prepend=gap_ids[0] - 2) > 1)
+    return gap_ids[run_positions], np.diff(np.append(run_positions, len(gap_ids)))
+
+
+def iterate_gap_runs(run_starts: np.ndarray,
+                     run_lengths: np.ndarray) -> Iterator[Tuple[int, int]]:
+    """
+    Function iterates over the runs of gaps
+
+    :param run_starts: first indices of the runs
+    :param run_lengths: lengths of the runs
+    :return: iterator over the start and the stop (exclusive) indices of the runs
+    """
+
+    for run_start, run_length in zip(run_starts.tolist(), run_lengths.tolist()):
+        yield run_start, run_start + run_length
+
+
+def longest_known_part(series: np.ndarray, gap_value: float) -> np.ndarray:
+    """
+    Function finds the longest part of the time series without gaps
+
+    :param series: one-dimensional array of a time series
+    :param gap_value: value, which identify gap elements in array
+    :return: the longest continuous part without gaps
+    """
+
+    known_starts, known_lengths = find_gap_runs(np.asarray(series) != gap_value)
+    if len(known_starts) == 0:
+        return np.asarray(series)[:0]
+    longest_run = np.argmax(known_lengths)
+    known_start = known_starts[longest_run]
+    return np.asarray(series)[known_start:known_start + known_lengths[longest_run]]
+
+
+def rare_fit_forecast_length(train_length: int, max_gap: int,
+                             max_window_size: int) -> int:
+    """
+    Function returns the number of elements forecasted at once by the chain,
+    which is fitted once for all the gaps. The longest gap is forecasted at
+    once, if at least half of the lagged table of the training part remains
+    for the fit, otherwise the gaps are forecasted in the steps
+
+    :param train_length: length of the training part
+    :param max_gap: length of the longest gap
+    :param max_window_size: window length
+    :return: forecast length of the chain
+    """
+
+    return int(max(1, min(max_gap, (train_length - max_window_size) // 2)))
+
+
+def gap_run_ids(run_lengths: np.ndarray) -> np.ndarray:
+    """
+    Function returns the index of the run for every gap element
+
+    :param run_lengths: lengths of the runs
+    :return: array with the run index for every gap element in the order of the series
+    """
+
+    return np.repeat(np.arange(len(run_lengths)), run_lengths)
+
+
+def _nearest_neighbors(centers: np.ndarray, left_ids: np.ndarray,
+                       is_left: np.ndarray, known_ids: np.ndarray,
+                       n_neighbors: int):
+    """
+    Function finds the nearest neighbours of the points among the candidates
+    on the left and the known elements on the right. The neighbours at the
+    same distance are taken from the left first
+
+    :param centers: indices of the points
+    :param left_ids: array with the candidate indices on the left for every point
+    :param is_left: boolean array with False for the missing candidates on the left
+    :param known_ids: sorted indices of the known elements
+    :param n_neighbors: number of the neighbours
+    :return: array with indices of the neighbours for every point and boolean
+    array with False for the missing neighbours (near the edges of the series)
+    """
+
+    centers = centers[:, np.newaxis]
+    right_positions = np.searchsorted(known_ids, centers, side='right') + np.arange(n_neighbors)
+    is_right = right_positions < len(known_ids)
+    if len(known_ids) > 0:
+        right_ids = known_ids[np.minimum(right_positions, len(known_ids) - 1)]
+    else:
+        right_ids = np.zeros_like(right_positions)
+
+    candidate_ids = np.concatenate([left_ids, right_ids], axis=1)
+    is_candidate = np.concatenate([is_left, is_right], axis=1)
+    distances = np.where(is_candidate, np.abs(candidate_ids - centers),
+                         np.iinfo(np.int64).max)
+    nearest = np.argsort(distances, axis=1, kind='stable')[:, :n_neighbors]
+    return (np.take_along_axis(candidate_ids, nearest, axis=1),
+            np.take_along_axis(is_candidate, nearest, axis=1))
+
+
+def _previous_ids(first_ids: np.ndarray, n_neighbors: int):
+    """
+    Function returns the elements preceding the intervals, which are known
+    or already filled for the filling from left to right
+
+    :param first_ids: indices of the first elements of the intervals
+    :param n_neighbors: number of the neighbours
+    :return: array with n_neighbors previous indices for every interval and
+    boolean array with False for the indices before the series start
+    """
+
+    left_ids = first_ids[:, np.newaxis] - np.arange(1, n_neighbors + 1)
+    return left_ids, left_ids >= 0
+
+
+def _previous_known_ids(centers: np.ndarray, known_ids: np.ndarray,
+                        n_neighbors: int):
+    """
+    Function returns the initially known elements preceding the points
+
+    :param centers: indices of the points
+    :param known_ids: sorted indices of the known elements
+    :param n_neighbors: number of the neighbours
+    :return: array with n_neighbors previous known indices for every point and
+    boolean array with False for the missing elements
+    """
+
+    left_positions = (np.searchsorted(known_ids, centers)[:, np.newaxis] -
+                      np.arange(1, n_neighbors + 1))
+    is_left = left_positions >= 0
+    if len(known_ids) == 0:
+        return np.zeros_like(left_positions), is_left
+    return known_ids[np.maximum(left_positions, 0)], is_left
+
+
+def _poly_operators(offsets: np.ndarray, is_neighbor: np.ndarray, degree: int,
+                    chunk_size: int = 100000) -> np.ndarray:
+    """
+    Function calculates the linear operators, which give the coefficients of
+    the least squares polynomials (as np.polyfit does) from the values of the
+    neighbours. The coefficients are in the coordinates relative to the
+    points and in the ascending order of the powers
+
+    :param offsets: positions of the neighbours relative to the points
+    :param is_neighbor: boolean array with False for the missing neighbours
+    :param degree: degree of a polynomial function
+    :param chunk_size: number of the points processed at once
+    :return: array with the operator of the shape (degree + 1, n_neighbors)
+    for every point
+    """
+
+    powers = np.arange(degree + 1)
+    operators = np.empty((len(offsets), degree + 1, offsets.shape[1]))
+    for start in range(0, len(offsets), chunk_size):
+        stop = start + chunk_size
+        vander = offsets[start:stop, :, np.newaxis].astype(float) ** powers
+        vander *= is_neighbor[start:stop, :, np.newaxis]
+        # The columns are scaled as in np.polyfit to improve the condition
+        scale = np.sqrt(np.sum(vander ** 2, axis=1, keepdims=True))
+        scale[scale == 0] = 1.0
+        operators[start:stop] = (np.linalg.pinv(vander / scale) /
+                                 np.swapaxes(scale, 1, 2))
+    return operators
+
+
+def _shared_poly_operators(offsets_list: list, is_neighbor_list: list,
+                           degree: int) -> list:
+    """
+    Function calculates the operators of the polynomials for several sets of
+    points at once, the points with the same neighbourhood share the operator
+
+    :param offsets_list: list with the positions of the neighbours relative
+    to the points for every set
+    :param is_neighbor_list: list with the boolean arrays with False for the
+    missing neighbours for every set
+    :param degree: degree of a polynomial function
+    :return: list with the operators (as _poly_operators returns) for every set
+    """
+
+    offsets = np.concatenate(offsets_list)
+    is_neighbor = np.concatenate(is_neighbor_list)
+    split_ids = np.cumsum([len(set_offsets) for set_offsets in offsets_list])[:-1]
+    if len(offsets) == 0:
+        return np.split(np.zeros((0, degree + 1, offsets.shape[1])), split_ids)
+
+    neighborhoods = np.concatenate([np.where(is_neighbor, offsets, 0), is_neighbor], axis=1)
+    _, unique_ids, inverse_ids = np.unique(neighborhoods, axis=0,
+                                           return_index=True, return_inverse=True)
+    operators = _poly_operators(offsets[unique_ids], is_neighbor[unique_ids], degree)
+    return np.split(operators[inverse_ids.ravel()], split_ids)
+
+
+def _columns(series: np.ndarray) -> list:
+    """
+    Function returns the views of the time series of the array
+
+    :param series: one-dimensional array of a time series or two-dimensional
+    array with the time series in columns
+    :return: list with the one-dimensional views, which can be filled in place
+    """
+
+    if series.ndim == 1:
+        return [series]
+    return [series[:, column_id] for column_id in range(series.shape[1])]
+
+
+def _dependency_waves(first_ids: np.ndarray, last_ids: np.ndarray,
+                      n_neighbors: int) -> list:
+    """
+    Function splits the gap intervals (or single gap elements) into the waves,
+    which can be filled at once. The interval depends on the filled gaps among
+    n_neighbors elements before it, so the intervals closer than that form
+    the chains, which are filled one by one, while the different chains are
+    filled together
+
+    :param first_ids: sorted indices of the first elements of the intervals
+    :param last_ids: indices of the last elements of the intervals
+    :param n_neighbors: number of the neighbours
+    :return: list of arrays with positions of the intervals for every wave
+    """
+
+    is_chain_start = np.ones(len(first_ids), dtype=bool)
+    is_chain_start[1:] = first_ids[1:] - last_ids[:-1] > n_neighbors
+    chain_starts = np.flatnonzero(is_chain_start)
+    positions_in_chain = (np.arange(len(first_ids)) -
+                          chain_starts[np.cumsum(is_chain_start) - 1])
+
+    order = np.argsort(positions_in_chain, kind='stable')
+    wave_sizes = np.bincount(positions_in_chain)
+    return np.split(order, np.cumsum(wave_sizes)[:-1])
+
+
+def _group_by_wave(interval_ids: np.ndarray, waves: list) -> list:
+    """
+    Function splits the gap elements according to the waves of their intervals
+
+    :param interval_ids: interval index for every gap element
+    :param waves: list of arrays with the intervals of every wave
+    :return: list of arrays with positions of the gap elements for every wave
+    """
+
+    wave_by_interval = np.empty(sum(len(wave) for wave in waves), dtype=int)
+    for wave_index, wave in enumerate(waves):
+        wave_by_interval[wave] = wave_index
+    wave_by_gap = wave_by_interval[interval_ids]
+    order = np.argsort(wave_by_gap, kind='stable')
+    wave_sizes = np.bincount(wave_by_gap, minlength=len(waves))
+    return np.split(order, np.cumsum(wave_sizes)[:-1])
+
+
+def _forecasting_task(forecast_length: int, max_window_size: int) -> Task:
+    return Task(TaskTypesEnum.ts_forecasting,
+                TsForecastingParams(forecast_length=forecast_length,
+                                    max_window_size=max_window_size,
+                                    return_all_steps=False,
+                                    make_future_prediction=True))
+
+
+def lagged_windows(series: np.ndarray, max_window_size: int,
+                   forecast_length: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Function builds the lagged table of the time series as the read-only
+    strided views of the series without copying it. The row i corresponds to
+    the forecast of the elements from i + max_window_size: the features are
+    the max_window_size elements before them (the nearest one first, as in
+    the lagged table of FEDOT) and the target is the forecast_length elements
+
+    :param series: one-dimensional time series (may be a strided view, i.e.
+    the column of the two-dimensional array)
+    :param max_window_size: number of the lagged elements
+    :param forecast_length: number of the forecasted elements
+    :return: features with max_window_size columns and target with
+    forecast_length columns for len(series) - max_window_size - forecast_length + 1 rows
+    """
+
+    series = np.asarray(series, dtype=float)
+    window_size = max_window_size + forecast_length
+    n_rows = len(series) - window_size + 1
+    if n_rows < 1:
+        raise ValueError(f'Time series of length {len(series)} is shorter than the window {window_size}')
+
+    stride = series.strides[0]
+    windows = np.lib.stride_tricks.as_strided(series, shape=(n_rows, window_size),
+                                              strides=(stride, stride), writeable=False)
+    return windows[:, max_window_size - 1::-1], windows[:, max_window_size:]
+
+
+def accepts_lagged_table(chain) -> bool:
+    """
+    :param chain: TsForecastingChain
+    :return: True if the chain consists of the primary node, which model
+    takes the lagged table (the inputs of the secondary nodes are made from
+    the time series by FEDOT)
+    """
+
+    root_node = chain.root_node
+    return (isinstance(root_node, PrimaryNode) and
+            DataTypesEnum.ts_lagged_table in root_node.model.metadata.input_types)
+
+
+def fit_chain(chain, series: np.ndarray, forecast_length: int, max_window_size: int,
+              strided_windows: bool = False):
+    """
+    Function fits the chain for the time series forecasting as
+    TsForecastingChain.fit does. With strided_windows the chain, which takes
+    the lagged table, is fitted on the strided views of the series instead,
+    so the design matrix is not built by FEDOT for every fit. The option is
+    disabled by default: the fitted models (i.e. ridge) differ from the ones
+    of TsForecastingChain.fit, which changes the forecasts by about 1e-3
+
+    :param chain: TsForecastingChain to fit
+    :param series: time series for training the model
+    :param forecast_length: number of elements predicted at once
+    :param max_window_size: window length
+    :param strided_windows: if True, the lagged table is made of the strided views
+    :return: fitted chain
+    """
+
+    task = _forecasting_task(forecast_length, max_window_size)
+    n_rows = len(series) - max_window_size - forecast_length + 1
+    # FEDOT checks the window size against the length of the target, so the
+    # table with less rows than the window is built by FEDOT from the series
+    if strided_windows and accepts_lagged_table(chain) and n_rows >= max_window_size:
+        features, target = lagged_windows(series, max_window_size, forecast_length)
+        input_data = InputData(idx=np.arange(0, n_rows),
+                               features=features,
+                               target=target,
+                               task=task,
+                               data_type=DataTypesEnum.ts_lagged_table)
+    else:
+        input_data = InputData(idx=np.arange(0, len(series)),
+                               features=None,
+                               target=series,
+                               task=task,
+                               data_type=DataTypesEnum.ts)
+    chain.fit_from_scratch(input_data)
+    return chain
+
+
+def chain_forecast(chain, context: np.ndarray, len_forecast: int,
+                   forecast_length: int, max_window_size: int,
+                   strided_windows: bool = False) -> np.ndarray:
+    """
+    Function makes the forecast with the fitted chain in the steps of
+    forecast_length elements with TsForecastingChain.forecast. With
+    strided_windows the steps are repeated for the chain, which takes the
+    lagged table, and the rows of every step are the strided views of the
+    buffer with the forecasted values
+
+    :param chain: fitted TsForecastingChain
+    :param context: part of the time series before the forecast (at least
+    max_window_size elements)
+    :param len_forecast: number of the forecasted elements
+    :param forecast_length: number of elements predicted by the chain at once
+    :param max_window_size: window length
+    :param strided_windows: if True, the rows of the steps are the strided views
+    :return: array with the forecasted values
+    """
+
+    if not (strided_windows and accepts_lagged_table(chain)) or len(context) < max_window_size:
+        task = _forecasting_task(forecast_length, max_window_size)
+        initial_data = InputData(idx=np.arange(0, len(context)),
+                                 features=None,
+                                 target=context,
+                                 task=task,
+                                 data_type=DataTypesEnum.ts)
+
+        # "Test data" for making prediction for a specific length
+        test_data = InputData(idx=np.arange(0, len_forecast),
+                              features=None,
+                              target=None,
+                              task=task,
+                              data_type=DataTypesEnum.ts)
+
+        return chain.forecast(initial_data=initial_data,
+                              supplementary_data=test_data).predict
+
+    steps_num = int(np.ceil(len_forecast / forecast_length))
+    buffer = np.empty(max_window_size + steps_num * forecast_length)
+    buffer[:max_window_size] = context[len(context) - max_window_size:]
+    # The views see the values written to the buffer at the previous steps
+    features, _ = lagged_windows(buffer, max_window_size, 0)
+    for step in range(steps_num):
+        # FEDOT takes the whole forecast of the last window at the first
+        # step and the last forecasted element of every window after it
+        first_row = 0 if step == 0 else (step - 1) * forecast_length + 1
+        last_row = step * forecast_length + 1
+        predict_data = InputData(idx=np.arange(0, last_row - first_row),
+                                 features=features[first_row:last_row],
+                                 target=None,
+                                 task=_forecasting_task(forecast_length, max_window_size),
+                                 data_type=DataTypesEnum.ts_lagged_table)
+        stepwise_prediction = np.ravel(chain.predict(predict_data).predict)[-forecast_length:]
+        start = max_window_size + step * forecast_length
+        buffer[start:start + forecast_length] = stepwise_prediction
+    return buffer[max_window_size:max_window_size + len_forecast]
+
+
+def _series_hash(series: np.ndarray) -> str:
+    return hashlib.sha1(np.ascontiguousarray(series, dtype=float).tobytes()).hexdigest()
+
+
+class _InPlaceExecutor:
+    """
+    Executor with the interface of ProcessPoolExecutor, which makes the calls
+    in the current process at once
+    """
+
+    def submit(self, function, *args) -> Future:
+        future = Future()
+        future.set_result(function(*args))
+        return future
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+def _fit_predict_executor(n_jobs: int):
+    """
+    Function returns the executor for fitting the chains
+
+    :param n_jobs: number of the processes (-1 for all the cores)
+    :return: the pool of the spawned processes or the executor in the
+    current process for a single job
+    """
+
+    if n_jobs == -1:
+        n_jobs = os.cpu_count()
+    if n_jobs <= 1:
+        return _InPlaceExecutor()
+    # The workers are spawned as in the benchmark executor, so the threads of
+    # the parent process are not inherited in an unknown state
+    return ProcessPoolExecutor(max_workers=n_jobs, mp_context=get_context('spawn'))
+
+
+class SimpleGapFiller:
+    """
+    Base class used for filling in the gaps in time series with simple methods.
+    Methods from the SimpleGapFiller class can be used for comparison with more
+    complex models in class ModelGapFiller
+
+    :param gap_value: value, which identify gap elements in array
+    """
+
+    def __init__(self, gap_value: float = -100.0):
+        self.gap_value = gap_value
+
+    def linear_interpolation(self, input_data):
+        """
+        Method allows to restore missing values in an array
+        using linear interpolation
+
+        :param input_data: array with gaps or two-dimensional array with the
+        time series with gaps in columns
+        :return: array without gaps
+        """
+
+        output_data = np.array(input_data, dtype=float)
+        gap_mask = output_data == self.gap_value
+        # The time series of all the columns are interpolated at once
+        return linear_interpolation_batch(output_data.T, gap_mask=gap_mask.T).T
+
+    def local_poly_approximation(self, input_data, degree: int = 2,
+                                 n_neighbors: int = 5):
+        """
+        Method allows to restore missing values in an array
+        using Savitzky-Golay filter
+
+        :param input_data: array with gaps or two-dimensional array with the
+        time series with gaps in columns
+        :param degree: degree of a polynomial function
+        :param n_neighbors: number of neighboring known elements of the time
+        series that the approximation is based on
+        :return: array without gaps
+        """
+
+        output_data = np.array(input_data)
+
+        columns_gaps = []
+        for column in _columns(output_data):
+            is_gap = column == self.gap_value
+            gap_ids = np.flatnonzero(is_gap)
+            known_ids = np.flatnonzero(~is_gap)
+
+            # The gaps are filled from left to right, so all the previous
+            # elements are known or already filled, and only the initially
+            # known elements can be the neighbours on the right
+            left_ids, is_left = _previous_ids(gap_ids, n_neighbors)
+            neighbor_ids, is_neighbor = _nearest_neighbors(gap_ids, left_ids, is_left,
+                                                           known_ids, n_neighbors)
+            columns_gaps.append((gap_ids, neighbor_ids, is_neighbor))
+
+        # The neighbours of the gaps do not depend on the values, so the
+        # polynomial fits are reduced to the weights of the neighbours
+        # (the free coefficients of the polynomials around the gaps), which
+        # are shared by the gaps with the same neighbourhood in all the columns
+        columns_weights = _shared_poly_operators(
+            [neighbor_ids - gap_ids[:, np.newaxis] for gap_ids, neighbor_ids, _ in columns_gaps],
+            [is_neighbor for _, _, is_neighbor in columns_gaps], degree)
+
+        for column, (gap_ids, neighbor_ids, is_neighbor), weights in zip(_columns(output_data),
+                                                                         columns_gaps,
+                                                                         columns_weights):
+            weights = weights[:, 0, :]
+            for wave in _dependency_waves(gap_ids, gap_ids, n_neighbors):
+                neighbor_values = np.where(is_neighbor[wave],
+                                           column[neighbor_ids[wave]], 0.0)
+                column[gap_ids[wave]] = np.sum(weights[wave] * neighbor_values,
+                                               axis=1)
+
+        return output_data
+
+    def batch_poly_approximation(self, input_data, degree: int = 3,
+                                 n_neighbors: int = 10,
+                                 sequential: bool = True):
+        """
+        Method allows to restore missing values in an array using
+        batch polynomial approximations.
+        Approximation is applied not for individual omissions, but for
+        intervals of omitted values. The polynomials of all the intervals
+        are fitted at once
+
+        :param input_data: array with gaps or two-dimensional array with the
+        time series with gaps in columns
+        :param degree: degree of a polynomial function
+        :param n_neighbors: the number of neighboring known elements of
+        time series that the approximation is based on
+        :param sequential: if True, the intervals are filled from left to
+        right and the already filled intervals are used as the neighbours of
+        the next ones, otherwise only initially known elements are used and
+        all the intervals are independent
+        :return: array without gaps
+        """
+
+        output_data = np.array(input_data)
+
+        columns_intervals = []
+        for column in _columns(output_data):
+            is_gap = column == self.gap_value
+            gap_ids = np.flatnonzero(is_gap)
+            known_ids = np.flatnonzero(~is_gap)
+
+            # The intervals of gaps and their center points
+            first_ids, run_lengths = find_gap_runs(is_gap)
+            last_ids = first_ids + run_lengths - 1
+            interval_ids = gap_run_ids(run_lengths)
+            center_ids = (first_ids + last_ids) // 2
+
+            if sequential:
+                # All the elements before the interval are known or already filled
+                left_ids, is_left = _previous_ids(first_ids, n_neighbors)
+                waves = _dependency_waves(first_ids, last_ids, n_neighbors)
+            else:
+                left_ids, is_left = _previous_known_ids(center_ids, known_ids,
+                                                        n_neighbors)
+                waves = [np.arange(len(first_ids))]
+            neighbor_ids, is_neighbor = _nearest_neighbors(center_ids, left_ids, is_left,
+                                                           known_ids, n_neighbors)
+            columns_intervals.append((gap_ids, interval_ids, center_ids,
+                                      neighbor_ids, is_neighbor, waves))
+
+        # Local approximation by an n-th degree polynomial as the linear
+        # operator from the values of the neighbours to the coefficients
+        columns_operators = _shared_poly_operators(
+            [intervals[3] - intervals[2][:, np.newaxis] for intervals in columns_intervals],
+            [intervals[4] for intervals in columns_intervals], degree)
+
+        powers = np.arange(degree + 1)
+        for column, intervals, operators in zip(_columns(output_data), columns_intervals,
+                                                columns_operators):
+            gap_ids, interval_ids, center_ids, neighbor_ids, is_neighbor, waves = intervals
+            gap_waves = _group_by_wave(interval_ids, waves)
+            for wave, gap_wave in zip(waves, gap_waves):
+                neighbor_values = np.where(is_neighbor[wave],
+                                           column[neighbor_ids[wave]], 0.0)
+                coefs = np.einsum('ikn,in->ik', operators[wave], neighbor_values)
+
+                # Estimate the intervals according to their coefficients
+                wave_intervals = np.searchsorted(wave, interval_ids[gap_wave])
+                offsets = gap_ids[gap_wave] - center_ids[interval_ids[gap_wave]]
+                column[gap_ids[gap_wave]] = np.sum(
+                    coefs[wave_intervals] * offsets[:, np.newaxis].astype(float) ** powers,
+                    axis=1)
+
+        return output_data
+
+
+class ModelGapFiller(SimpleGapFiller):
+    """
+    Class used for filling in the gaps in time series
+
+    :param gap_value: value, which mask gap elements in array
+    :param chain: TsForecastingChain object for filling in the gaps
+    :param refit_every: number of the gaps filled by the chain before it is
+    refitted. With 1 the chain is fitted for every gap on the time series
+    before it, otherwise the chain is fitted on the longest part of the time
+    series without gaps and only makes forecasts for the next gaps
+    (with 0 the chain is fitted once)
+    :param drift_threshold: if set, the chain is also refitted when the mean
+    of the window before the gap differs from the mean of the training part
+    by more than drift_threshold standard deviations of the training part
+    :param max_train_size: if set, the chain is fitted only on the last
+    max_train_size elements of the training part nearest to the gap (i.e. a
+    multiple of max_window_size), so the fit time does not grow with the
+    position of the gap
+    :param strided_windows: if True, the chain, which takes the lagged table,
+    is fitted and makes forecasts on the strided views of the time series
+    (see fit_chain), otherwise as TsForecastingChain does
+
+    The input can be a two-dimensional array with the time series with gaps
+    in columns (i.e. for the different masks of the same time series). The
+    columns are filled one after another and the gaps with the same training
+    part in the different columns are predicted once
+    """
+
+    def __init__(self, gap_value, chain, refit_every: int = 1,
+                 drift_threshold: Optional[float] = None,
+                 max_train_size: Optional[int] = None,
+                 strided_windows: bool = False):
+        super().__init__(gap_value)
+        self.chain = chain
+        self.refit_every = refit_every
+        self.drift_threshold = drift_threshold
+        self.max_train_size = max_train_size
+        self.strided_windows = strided_windows
+        self._fit_cache = None
+
+    def __getstate__(self):
+        # The cache of the fits stays in the process, which fills in the gaps
+        state = self.__dict__.copy()
+        state['_fit_cache'] = None
+        return state
+
+    def forward_inverse_filling(self, input_data, max_window_size: int = 50,
+                                n_jobs: int = 1, independent_gaps: bool = False):
+        """
+        Method fills in the gaps in the input array using forward and inverse
+        directions of predictions.
+        The inverse forecast is based only on the known elements between the
+        gap and the next one, so all the inverse chains are fitted in parallel.
+        The forward forecast is based on the whole time series before the gap
+        with the gaps filled before, so by default the forward chains are
+        fitted one after another in the current process while the inverse ones
+        are fitted in the pool. The forward fits are the critical path then, and
+        n_jobs speeds the method up by at most about two times whatever the
+        number of gaps; the gaps are processed in parallel in both directions
+        only with independent_gaps=True
+
+        :param input_data: data with gaps to filling in the gaps in it
+        :param max_window_size: window length
+        :param n_jobs: number of the processes for fitting the inverse chains
+        (and the forward ones with independent_gaps=True), -1 for all the cores
+        :param independent_gaps: if True, the forward forecast is based only on
+        the known elements between the previous gap and the gap, so the chains
+        for all the gaps are fitted in parallel. The gap with less than
+        max_window_size + len_gap known elements before it is forecasted
+        from the whole time series before it as without the option
+        :return: array without gaps
+        """
+
+        output_data = np.array(input_data)
+        if output_data.ndim == 2:
+            return self._fill_columns(output_data, self.forward_inverse_filling,
+                                      max_window_size=max_window_size, n_jobs=n_jobs,
+                                      independent_gaps=independent_gaps)
+
+        # Intervals of gaps and the bounds of the known parts around them
+        run_starts, run_lengths = find_gap_runs(output_data == self.gap_value)
+        if self.refit_every != 1:
+            # The few fits are made in the current process
+            return self._rare_fit_filling(output_data, run_starts, run_lengths,
+                                          max_window_size, with_inverse=True)
+        run_stops = run_starts + run_lengths
+        left_bounds = np.concatenate(([0], run_stops[:-1]))
+        right_bounds = np.concatenate((run_starts[1:], [len(output_data)]))
+
+        with _fit_predict_executor(n_jobs) as executor:
+            # The time series after the gap is reversed for the inverse forecast
+            inverse_futures = [self._submit_fit_predict(executor,
+                                                        np.flip(output_data[gap_stop:right_bound]),
+                                                        gap_stop - gap_start,
+                                                        max_window_size)
+                               for (gap_start, gap_stop), right_bound in
+                               zip(iterate_gap_runs(run_starts, run_lengths), right_bounds.tolist())]
+            if independent_gaps:
+                # The lagged table of the shorter part has no rows to fit on
+                forward_futures = [self._submit_fit_predict(executor,
+                                                            output_data[left_bound:gap_start],
+                                                            gap_stop - gap_start,
+                                                            max_window_size)
+                                   if gap_start - left_bound >= max_window_size + gap_stop - gap_start
+                                   else None
+                                   for (gap_start, gap_stop), left_bound in
+                                   zip(iterate_gap_runs(run_starts, run_lengths), left_bounds.tolist())]
+
+            # Iterately fill in the gaps in the time series
+            for run_index, (gap_start, gap_stop) in enumerate(iterate_gap_runs(run_starts, run_lengths)):
+                len_gap = gap_stop - gap_start
+                if independent_gaps and forward_futures[run_index] is not None:
+                    forward_values = forward_futures[run_index].result()
+                else:
+                    # The entire time series is used for training until the gap
+                    forward_values = self._cached_fit_predict(output_data[:gap_start],
+                                                              len_gap,
+                                                              max_window_size)
+                inverse_values = np.flip(inverse_futures[run_index].result())
+
+                # Two predictions are generated for each gap - forward and
+                # backward, the closer to the known part the more weight
+                preds = np.array([forward_values, inverse_values])
+                weights = np.array([np.arange(len_gap, 0, -1),
+                                    np.arange(1, (len_gap + 1), 1)])
+                result = np.average(preds, axis=0, weights=weights)
+
+                # Replace gaps in an array with predicted values
+                output_data[gap_start:gap_stop] = result
+
+        return output_data
+
+    def forward_filling(self, input_data, max_window_size: int = 50):
+        """
+        Method fills in the gaps in the input array using chain with only
+        forward direction (i.e. time series forecasting)
+
+        :param input_data: data with gaps to filling in the gaps in it
+        :param max_window_size: window length
+        :return: array without gaps
+        """
+
+        output_data = np.array(input_data)
+        if output_data.ndim == 2:
+            return self._fill_columns(output_data, self.forward_filling,
+                                      max_window_size=max_window_size)
+
+        # Intervals of gaps
+        run_starts, run_lengths = find_gap_runs(output_data == self.gap_value)
+        if self.refit_every != 1:
+            return self._rare_fit_filling(output_data, run_starts, run_lengths,
+                                          max_window_size, with_inverse=False)
+
+        # Iterately fill in the gaps in the time series
+        for gap_start, gap_stop in iterate_gap_runs(run_starts, run_lengths):
+            # The entire time series is used for training until the gap
+            timeseries_train_part = output_data[:gap_start]
+
+            # Adaptive prediction interval length
+            len_gap = gap_stop - gap_start
+
+            # Chain for the task of filling in gaps
+            predicted = self._cached_fit_predict(timeseries_train_part,
+                                                 len_gap,
+                                                 max_window_size)
+
+            # Replace gaps in an array with predicted values
+            output_data[gap_start:gap_stop] = predicted
+        return output_data
+
+    def _rare_fit_filling(self, output_data: np.ndarray, run_starts: np.ndarray,
+                          run_lengths: np.ndarray, max_window_size: int,
+                          with_inverse: bool):
+        """
+        The method fills in the gaps with the chains, which are fitted on the
+        longest part of the time series without gaps and refitted only every
+        refit_every gaps or after the drift. The forward chain makes forecasts
+        from the time series before the gap and the inverse chain, which is
+        fitted on the reversed training part, from the time series after it.
+        The forecast length of the chains is limited by the length of the
+        training part (see rare_fit_forecast_length), so the gap close to it
+        in length does not leave the fit with a few rows of the lagged table
+
+        :param output_data: one-dimensional array of a time series to fill in
+        :param run_starts: array with first indices of the gap intervals
+        :param run_lengths: array with lengths of the gap intervals
+        :param max_window_size: window length
+        :param with_inverse: if True, the forward and the inverse forecasts are
+        averaged, otherwise only the forward forecast is used
+        :return: array without gaps
+        """
+
+        if len(run_starts) == 0:
+            return output_data
+
+        max_gap = int(run_lengths.max())
+        right_bounds = np.concatenate((run_starts[1:], [len(output_data)]))
+
+        # The chains are fitted before the first gap
+        chains = None
+        timeseries_train = None
+        gaps_since_fit = 0
+        for run_index, (gap_start, gap_stop) in enumerate(iterate_gap_runs(run_starts, run_lengths)):
+            len_gap = gap_stop - gap_start
+            forward_context = output_data[:gap_start]
+
+            if (timeseries_train is None or 0 < self.refit_every <= gaps_since_fit or
+                    self._is_drifted(timeseries_train, forward_context[-max_window_size:])):
+                # The gaps filled before are the known elements for the refit
+                timeseries_train = self._bounded_train_part(
+                    longest_known_part(output_data, self.gap_value))
+                # The chains forecast the longest gap at once and the shorter ones
+                # as the beginning of it, if the training part is long enough
+                forecast_length = rare_fit_forecast_length(len(timeseries_train), max_gap,
+                                                           max_window_size)
+                chains = [self._cached_fit_chain(timeseries_train, forecast_length,
+                                                 max_window_size)]
+                if with_inverse:
+                    chains.append(self._cached_fit_chain(np.flip(timeseries_train),
+                                                         forecast_length, max_window_size))
+                gaps_since_fit = 0
+            gaps_since_fit += 1
+
+            preds = []
+            weights = []
+            # The forecast needs the window of the known elements
+            if len(forward_context) >= max_window_size:
+                preds.append(self._chain_forecast(chains[0], forward_context, len_gap,
+                                                  forecast_length, max_window_size))
+                weights.append(np.arange(len_gap, 0, -1))
+            inverse_context = np.flip(output_data[gap_stop:right_bounds[run_index]])
+            if with_inverse and len(inverse_context) >= max_window_size:
+                preds.append(np.flip(self._chain_forecast(chains[1], inverse_context, len_gap,
+                                                          forecast_length, max_window_size)))
+                weights.append(np.arange(1, (len_gap + 1), 1))
+
+            if not preds:
+                # The chain is fitted on the short part before the gap as before
+                result = self._cached_fit_predict(forward_context, len_gap,
+                                                  max_window_size)
+            else:
+                result = np.average(np.array(preds), axis=0, weights=np.array(weights))
+
+            # Replace gaps in an array with predicted values
+            output_data[gap_start:gap_stop] = result
+
+        return output_data
+
+    def _is_drifted(self, timeseries_train: np.ndarray,
+                    timeseries_window: np.ndarray) -> bool:
+        """
+        The method checks if the time series before the gap has drifted away
+        from the training part of the chain
+
+        :param timeseries_train: part of the time series the chain is fitted on
+        :param timeseries_window: window of the time series before the gap
+        :return: True if the chain should be refitted
+        """
+
+        if self.drift_threshold is None or len(timeseries_window) == 0:
+            return False
+        shift = abs(np.mean(timeseries_window) - np.mean(timeseries_train))
+        return shift > self.drift_threshold * np.std(timeseries_train)
+
+    def _fill_columns(self, output_data: np.ndarray, fill_method, **fill_params):
+        """
+        The method fills in the columns one after another with the shared
+        cache of the fits, so the columns with the same prefix of the gaps
+        reuse the chains and the forecasts
+
+        :param output_data: two-dimensional array with the time series with
+        gaps in columns
+        :param fill_method: method, which fills in the one-dimensional array
+        :param fill_params: parameters of the method
+        :return: array without gaps
+        """
+
+        self._fit_cache = {}
+        try:
+            for column in _columns(output_data):
+                column[:] = fill_method(column, **fill_params)
+        finally:
+            self._fit_cache = None
+        return output_data
+
+    def _submit_fit_predict(self, executor, timeseries_train: np.ndarray,
+                            len_gap: int, max_window_size: int) -> Future:
+        """
+        The method submits the fit and the prediction to the executor, if the
+        same prediction was not made for the previous columns
+
+        :param executor: executor for the fit
+        :param timeseries_train: part of the time series for training the model
+        :param len_gap: number of elements in the gap
+        :param max_window_size: window length
+        :return: future of the predicted values in the gap
+        """
+
+        timeseries_train = self._bounded_train_part(timeseries_train)
+        if self._fit_cache is None:
+            return executor.submit(self._chain_fit_predict, timeseries_train,
+                                   len_gap, max_window_size)
+
+        key = ('forecast', _series_hash(timeseries_train), len_gap, max_window_size)
+        if key not in self._fit_cache:
+            self._fit_cache[key] = executor.submit(self._chain_fit_predict, timeseries_train,
+                                                   len_gap, max_window_size)
+        return self._fit_cache[key]
+
+    def _cached_fit_predict(self, timeseries_train: np.ndarray, len_gap: int,
+                            max_window_size: int):
+        return self._submit_fit_predict(_InPlaceExecutor(), timeseries_train,
+                                        len_gap, max_window_size).result()
+
+    def _cached_fit_chain(self, timeseries_train: np.ndarray, forecast_length: int,
+                          max_window_size: int):
+        if self._fit_cache is None:
+            return self._fit_chain(timeseries_train, forecast_length, max_window_size)
+
+        key = ('chain', _series_hash(timeseries_train), forecast_length, max_window_size)
+        if key not in self._fit_cache:
+            self._fit_cache[key] = self._fit_chain(timeseries_train, forecast_length,
+                                                   max_window_size)
+        return self._fit_cache[key]
+
+    def _bounded_train_part(self, timeseries_train: np.ndarray) -> np.ndarray:
+        """
+        The method limits the training part by max_train_size elements
+
+        :param timeseries_train: part of the time series for training the
+        model, which ends near the gap
+        :return: the last max_train_size elements of the part
+        """
+
+        if self.max_train_size is None:
+            return timeseries_train
+        return timeseries_train[-self.max_train_size:]
+
+    def _chain_fit_predict(self, timeseries_train: np.array,
+                           len_gap: int, max_window_size: int):
+        """
+        The method makes a prediction as a sequence of elements based on a
+        training sample. There are two main parts: fit model and predict.
+
+        :param timeseries_train: part of the time series for training the model
+        :param len_gap: number of elements in the gap
+        :param max_window_size: window length
+        :return: array without gaps
+        """
+
+        timeseries_train = self._bounded_train_part(timeseries_train)
+        chain = self._fit_chain(timeseries_train, len_gap, max_window_size)
+        return self._chain_forecast(chain, timeseries_train, len_gap, len_gap,
+                                    max_window_size)
+
+    def _fit_chain(self, timeseries_train: np.array, forecast_length: int,
+                   max_window_size: int):
+        """
+        The method fits the copy of the chain, so the fitted chains for
+        the different parts of the time series can be used together
+
+        :param timeseries_train: part of the time series for training the model
+        :param forecast_length: number of elements predicted at once
+        :param max_window_size: window length
+        :return: fitted TsForecastingChain
+        """
+
+        return fit_chain(deepcopy(self.chain), timeseries_train, forecast_length,
+                         max_window_size, strided_windows=self.strided_windows)
+
+    def _chain_forecast(self, chain, timeseries_context: np.array, len_gap: int,
+                        forecast_length: int, max_window_size: int):
+        """
+        The method makes a prediction for the gap with the fitted chain
+
+        :param chain: fitted TsForecastingChain
+        :param timeseries_context: part of the time series before the gap
+        (at least max_window_size elements)
+        :param len_gap: number of elements in the gap
+        :param forecast_length: number of elements predicted by the chain at once
+        :param max_window_size: window length
+        :return: array with predicted values in the gap
+        """
+
+        return chain_forecast(chain, timeseries_context, len_gap, forecast_length,
+                              max_window_size, strided_windows=self.strided_windows)
+
+
+def validate(parameter, mask, data, withoutgap_arr, gap_value=-100.0):
+    """
+    Function prints the metrics of the restored values in the gaps and
+    plots the original and the restored time series
+
+    :param parameter: name of the column with the original time series
+    :param mask: name of the column with the time series with gaps
+    :param data: dataframe with the columns and the 'Date' column
+    :param withoutgap_arr: array without gaps
+    :param gap_value: value, which identify gap elements in array
+    """
+
+    # The plots are needed only by the scripts, so matplotlib is not
+    # imported with the gap fillers in the worker processes
+    from matplotlib import pyplot as plt
+
+    arr_parameter = np.array(data[parameter])
+    arr_mask = np.array(data[mask])
+    ids_gaps = np.flatnonzero(arr_mask == gap_value)
+
+    true_values = arr_parameter[ids_gaps]
+    predicted_values = withoutgap_arr[ids_gaps]
+    print(mask)
+    print(f'Общая длина временного ряда: {len(arr_parameter)}')
+    print('Совокупный размер пропусков:', len(true_values))
+    print('Минимальное значение в пропуске - ', min(true_values))
+    print('Максимальное значение в пропуске- ', max(true_values))
+
+    # Выводим на экран метрики
+    metrics = error_metrics(true_values, predicted_values)
+    print('Mean absolute error -', round(metrics['MAE'], 4))
+    print('RMSE -', round(metrics['RMSE'], 4))
+    print('Median absolute error -', round(metrics['MedianAE'], 4))
+    print('MAPE -', round(metrics['MAPE'], 4), '\n')
+
+    # Массив с пропусками
+    array_gaps = np.ma.masked_where(arr_mask == gap_value, arr_mask)
+
+    plt.plot(data['Date'], arr_parameter, c='green', alpha=0.5, label='Actual values')
+    plt.plot(data['Date'], withoutgap_arr, c='red', alpha=0.5, label='Predicted values')
+    plt.plot(data['Date'], array_gaps, c='blue', alpha=1.0)
+    plt.ylabel('Sea level, m', fontsize=15)
+    plt.xlabel('Date', fontsize=15)
+    plt.grid()
+    plt.legend(fontsize=15)
+    plt.show()
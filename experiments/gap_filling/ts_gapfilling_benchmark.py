@@ -0,0 +1,141 @@
+import argparse
+import os
+import time
+import tracemalloc
+from collections import OrderedDict
+
+import matplotlib
+
+# The validation plots of the imported scripts are never shown
+matplotlib.use('Agg')
+
+import numpy as np
+import pandas as pd
+from fedot.core.chains.node import PrimaryNode
+from fedot.core.chains.ts_chain import TsForecastingChain
+
+# resource_usage.py is in the root of the repository, so the root is expected in PYTHONPATH
+from resource_usage import collect_resource_usage
+from restored_series_store import RestoredSeriesStore
+from ts_gapfilling import ModelGapFiller, SimpleGapFiller
+from ts_gapfilling_composing import ComposingGapFiller, composing_initial_chain
+from ts_metrics import error_metrics
+
+# Единый запуск всех методов восстановления пропусков для всех файлов и
+# столбцов с масками с замером времени, пиковой памяти и точности
+
+GAP_VALUE = -100.0
+FILES = ['Synthetic.csv', 'Sea_hour.csv', 'Sea_10_240.csv']
+
+
+def _ridge_gapfiller():
+    return ModelGapFiller(gap_value=GAP_VALUE, chain=TsForecastingChain(PrimaryNode('ridge')))
+
+
+# Название метода: (папка для восстановленных рядов, функция восстановления)
+METHODS = OrderedDict([
+    ('Linear interpolation',
+     ('linear', lambda arr: SimpleGapFiller(GAP_VALUE).linear_interpolation(arr))),
+    ('Local polynomial approximation',
+     ('poly', lambda arr: SimpleGapFiller(GAP_VALUE).local_poly_approximation(arr, 4, 150))),
+    ('Batch polynomial approximation',
+     ('batch_poly', lambda arr: SimpleGapFiller(GAP_VALUE).batch_poly_approximation(arr, 4, 150))),
+    ('Ridge forward 30 ws',
+     ('fedot_ridge_30', lambda arr: _ridge_gapfiller().forward_filling(arr, max_window_size=30))),
+    ('Ridge forward 100 ws',
+     ('fedot_ridge_100', lambda arr: _ridge_gapfiller().forward_filling(arr, max_window_size=100))),
+    ('Ridge two-way 80 ws',
+     ('fedot_ridge_two_way_80', lambda arr: _ridge_gapfiller().forward_inverse_filling(arr, max_window_size=80))),
+    ('Chain compose',
+     ('fedot_composing', lambda arr: ComposingGapFiller(gap_value=GAP_VALUE,
+                                                        chain=composing_initial_chain()).forward_filling(
+         arr, max_window_size=30))),
+])
+
+
+def run_method(fill_function, with_gap_array, measure_memory=True):
+    # Время работы и пиковая память (в МБ) при восстановлении пропусков: tracemalloc видит
+    # только память интерпретатора Python, а массивы numpy, буферы BLAS и модели FEDOT
+    # учитываются в пиковом RSS процесса
+    if measure_memory:
+        tracemalloc.start()
+    try:
+        with collect_resource_usage() as usage:
+            start = time.perf_counter()
+            withoutgap_arr = fill_function(with_gap_array)
+            runtime = time.perf_counter() - start
+        peak_memory = tracemalloc.get_traced_memory()[1] / 1024 / 1024 if measure_memory else np.nan
+    finally:
+        if measure_memory:
+            tracemalloc.stop()
+    peak_rss = usage['peak_rss_mb'] if usage['peak_rss_mb'] is not None else np.nan
+    return withoutgap_arr, runtime, peak_memory, peak_rss
+
+
+def run_benchmark(data_folder, files, methods, columns=None, series_folder=None, measure_memory=True):
+    results = []
+    for file in files:
+        data = pd.read_csv(os.path.join(data_folder, file))
+        true_array = np.array(data['Height'])
+        gap_columns = [column for column in data.columns if column.startswith('gap')]
+        if columns is not None:
+            gap_columns = [column for column in gap_columns if column in columns]
+
+        for method in methods:
+            method_folder, fill_function = METHODS[method]
+            dataframe = data.copy()
+            for column in gap_columns:
+                with_gap_array = np.array(data[column])
+                withoutgap_arr, runtime, peak_memory, peak_rss = run_method(fill_function, with_gap_array,
+                                                                            measure_memory)
+                dataframe[column] = withoutgap_arr
+
+                ids_gaps = np.flatnonzero(with_gap_array == GAP_VALUE)
+                result = {'File': file, 'Column': column, 'Method': method,
+                          'Length': len(with_gap_array), 'Gaps': len(ids_gaps),
+                          'Runtime': runtime, 'Peak memory (MB)': peak_memory, 'Peak RSS (MB)': peak_rss,
+                          'Points per second': len(with_gap_array) / runtime if runtime > 0 else np.inf,
+                          **error_metrics(true_array[ids_gaps], withoutgap_arr[ids_gaps])}
+                print(file, column, method, f'runtime - {round(runtime, 4)}', f'MAE - {round(result["MAE"], 4)}')
+                results.append(result)
+
+            if series_folder is not None:
+                save_folder = os.path.join(series_folder, method_folder)
+                # Create folder if it doesnt exists
+                if os.path.isdir(save_folder) == False:
+                    os.makedirs(save_folder)
+                save_path = os.path.join(save_folder, file)
+                dataframe.to_csv(save_path)
+                if 'gap' in gap_columns:
+                    # The restored series for forecasting.py
+                    RestoredSeriesStore(os.path.join(series_folder, 'restored')).append(
+                        file, method_folder, dataframe['gap'], source_path=save_path)
+    return pd.DataFrame(results)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gap-filling benchmark for all the methods, files and '
+                                                 'gap columns with the runtime, the peak memory and the metrics')
+    parser.add_argument('--data', default='./data', help='folder with the csv files')
+    parser.add_argument('--files', nargs='+', default=FILES)
+    parser.add_argument('--methods', nargs='+', default=list(METHODS), choices=list(METHODS))
+    parser.add_argument('--columns', nargs='+', default=None,
+                        help='gap columns to fill (all the columns starting with "gap" by default)')
+    parser.add_argument('--results', default='./iccs_article/benchmark/results.csv',
+                        help='path to the results table')
+    parser.add_argument('--save-series', default=None,
+                        help='folder to save the restored series to (into the subfolder per method)')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='do not trace the Python memory, the tracing slows down the methods '
+                             '(the peak RSS is measured anyway)')
+    args = parser.parse_args()
+
+    results = run_benchmark(args.data, args.files, args.methods, columns=args.columns,
+                            series_folder=args.save_series, measure_memory=not args.no_memory)
+    print(results.round(4).to_string(index=False))
+
+    results_folder = os.path.dirname(args.results)
+    # Create folder if it doesnt exists
+    if results_folder and os.path.isdir(results_folder) == False:
+        os.makedirs(results_folder)
+    results.to_csv(args.results, index=False)
@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+import pandas as pd
+from fedot.core.chains.node import PrimaryNode
+from fedot.core.chains.ts_chain import TsForecastingChain
+
+from ts_gapfilling import ModelGapFiller, SimpleGapFiller
+from ts_metrics import METRICS, error_metrics
+
+# Восстановление пропусков во всех столбцах с масками (gap_1..gap_7, gap)
+# за один проход и таблица метрик для каждого столбца
+
+folder_to_save = './iccs_article/columns'
+
+
+def fill_columns(with_gap_arrays, gap_value=-100.0):
+    simple_gapfiller = SimpleGapFiller(gap_value=gap_value)
+    # Цепочка из одной модели
+    model_gapfiller = ModelGapFiller(gap_value=gap_value,
+                                     chain=TsForecastingChain(PrimaryNode('ridge')))
+
+    return {'Linear interpolation': simple_gapfiller.linear_interpolation(with_gap_arrays),
+            'Local polynomial approximation': simple_gapfiller.local_poly_approximation(with_gap_arrays,
+                                                                                       degree=4,
+                                                                                       n_neighbors=150),
+            'Batch polynomial approximation': simple_gapfiller.batch_poly_approximation(with_gap_arrays,
+                                                                                       degree=4,
+                                                                                       n_neighbors=150),
+            'FEDOT ridge': model_gapfiller.forward_filling(with_gap_arrays,
+                                                           max_window_size=100)}
+
+
+def columns_metrics(true_values, with_gap_arrays, withoutgap_arrays, columns, gap_value=-100.0):
+    # Метрики всех методов во всех столбцах за один вызов: строка - метод и столбец,
+    # в каждой строке учитываются только пропуски своего столбца
+    methods = list(withoutgap_arrays)
+    predicted_values = np.stack([withoutgap_arrays[method].T for method in methods])
+    gap_masks = (with_gap_arrays == gap_value).T
+    metrics = error_metrics(true_values, predicted_values, mask=gap_masks)
+
+    tables = {}
+    for column_id, column in enumerate(columns):
+        rows = [{'Method': method,
+                 **{name: round(metrics[name][method_id, column_id], 4) for name in METRICS}}
+                for method_id, method in enumerate(methods)]
+        tables[column] = pd.DataFrame(rows)
+    return tables
+
+
+if __name__ == '__main__':
+
+    for file in ['Sea_hour.csv', 'Sea_10_240.csv']:
+        print(file)
+        data = pd.read_csv(f'./data/{file}')
+        columns = [column for column in data.columns if column.startswith('gap')]
+        with_gap_arrays = np.array(data[columns])
+
+        withoutgap_arrays = fill_columns(with_gap_arrays)
+        tables = columns_metrics(np.array(data['Height']), with_gap_arrays,
+                                 withoutgap_arrays, columns)
+
+        # Create folder if it doesnt exists
+        if os.path.isdir(folder_to_save) == False:
+            os.makedirs(folder_to_save)
+        for column, table in tables.items():
+            print(column, f'- совокупный размер пропусков: {np.sum(data[column] == -100.0)}')
+            print(table.to_string(index=False), '\n')
+            table.to_csv(os.path.join(folder_to_save, f'{column}_{file}'), index=False)
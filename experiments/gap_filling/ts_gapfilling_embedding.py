@@ -0,0 +1,113 @@
+import os
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from fedot.core.chains.node import PrimaryNode
+from fedot.core.chains.ts_chain import TsForecastingChain
+from fedot.core.data.data import InputData
+from fedot.core.data.transformation import ts_to_lagged_table
+from fedot.core.repository.dataset_types import DataTypesEnum
+from fedot.core.repository.tasks import Task, TaskTypesEnum, TsForecastingParams
+
+from ts_gapfilling import chain_forecast, fit_chain, lagged_windows
+
+# Сравнение памяти и времени построения матрицы лагов средствами FEDOT
+# и в виде представлений (strided views) исходного ряда без копирования
+
+folder_to_save = './iccs_article/embedding'
+
+max_window_size = 500
+forecast_lengths = [50, 400]
+
+
+def measure(function, *args):
+    # Время работы и пиковая память (в МБ) при вызове функции
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        function(*args)
+        runtime = time.perf_counter() - start
+        peak_memory = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+    return runtime, peak_memory
+
+
+def ts_input_data(series, forecast_length):
+    task = Task(TaskTypesEnum.ts_forecasting,
+                TsForecastingParams(forecast_length=forecast_length,
+                                    max_window_size=max_window_size,
+                                    return_all_steps=True,
+                                    make_future_prediction=True))
+    return InputData(idx=np.arange(0, len(series)),
+                     features=None,
+                     target=series,
+                     task=task,
+                     data_type=DataTypesEnum.ts)
+
+
+def fedot_embedding(series, forecast_length):
+    # Таблица лагов, которую цепочка строит из временного ряда при обучении
+    return ts_to_lagged_table(ts_input_data(series, forecast_length))
+
+
+def fedot_fit_forecast(series, forecast_length):
+    # Обучение и прогноз по временному ряду (матрицу лагов строит FEDOT)
+    chain = TsForecastingChain(PrimaryNode('ridge'))
+    input_data = ts_input_data(series, forecast_length)
+    chain.fit_from_scratch(input_data)
+    test_data = InputData(idx=np.arange(0, forecast_length),
+                          features=None,
+                          target=None,
+                          task=input_data.task,
+                          data_type=DataTypesEnum.ts)
+    return chain.forecast(initial_data=ts_input_data(series, forecast_length),
+                          supplementary_data=test_data).predict
+
+
+def strided_fit_forecast(series, forecast_length):
+    # Обучение и прогноз по представлениям ряда
+    chain = fit_chain(TsForecastingChain(PrimaryNode('ridge')), series,
+                      forecast_length, max_window_size, strided_windows=True)
+    return chain_forecast(chain, series, forecast_length, forecast_length,
+                          max_window_size, strided_windows=True)
+
+
+if __name__ == '__main__':
+
+    results = []
+    for file in ['Synthetic.csv', 'Sea_hour.csv', 'Sea_10_240.csv']:
+        data = pd.read_csv(f'./data/{file}')
+        series = np.array(data['Height'], dtype=float)
+        for forecast_length in forecast_lengths:
+            for path, function in [('FEDOT lagged table', fedot_embedding),
+                                   ('Strided views', lambda arr, length: lagged_windows(arr, max_window_size,
+                                                                                        length)),
+                                   ('FEDOT fit and forecast', fedot_fit_forecast),
+                                   ('Strided fit and forecast', strided_fit_forecast)]:
+                runtime, peak_memory = measure(function, series, forecast_length)
+                result = {'File': file,
+                          'Length': len(series),
+                          'Forecast length': forecast_length,
+                          'Path': path,
+                          'Runtime': round(runtime, 4),
+                          'Peak memory (MB)': round(peak_memory, 2)}
+                print(result)
+                results.append(result)
+
+            # Путь через представления ряда включается опцией strided_windows, пока прогнозы
+            # отличаются от прогнозов цепочки, обученной средствами FEDOT
+            difference = np.abs(np.ravel(fedot_fit_forecast(series, forecast_length)) -
+                                strided_fit_forecast(series, forecast_length))
+            print(f'{file}, forecast length {forecast_length}: '
+                  f'max difference of the forecasts - {round(float(difference.max()), 6)}')
+
+    results = pd.DataFrame(results)
+    print(results.to_string(index=False))
+
+    # Create folder if it doesnt exists
+    if os.path.isdir(folder_to_save) == False:
+        os.makedirs(folder_to_save)
+    results.to_csv(os.path.join(folder_to_save, 'embedding.csv'), index=False)
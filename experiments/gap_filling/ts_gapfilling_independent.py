@@ -0,0 +1,36 @@
+import time
+
+import numpy as np
+import pandas as pd
+from fedot.core.chains.node import PrimaryNode
+from fedot.core.chains.ts_chain import TsForecastingChain
+
+from ts_gapfilling import ModelGapFiller
+from ts_metrics import error_metrics
+
+# Проверка двустороннего заполнения с независимыми пропусками (independent_gaps=True)
+# на Sea_hour.csv: в ряде есть пропуск (620 элементов с индекса 2500), перед которым
+# меньше max_window_size + len_gap известных элементов, и прогноз вперед для него
+# строится по всему ряду до пропуска
+
+if __name__ == '__main__':
+    data = pd.read_csv('./data/Sea_hour.csv')
+    with_gap_array = np.array(data['gap'])
+    ids_gaps = np.flatnonzero(with_gap_array == -100.0)
+    true_values = np.array(data['Height'])[ids_gaps]
+
+    for independent_gaps in [False, True]:
+        gapfiller = ModelGapFiller(gap_value=-100.0,
+                                   chain=TsForecastingChain(PrimaryNode('ridge')))
+        start = time.perf_counter()
+        withoutgap_arr = gapfiller.forward_inverse_filling(with_gap_array,
+                                                           max_window_size=80,
+                                                           n_jobs=-1,
+                                                           independent_gaps=independent_gaps)
+        runtime = time.perf_counter() - start
+
+        if np.any(withoutgap_arr == -100.0) or not np.all(np.isfinite(withoutgap_arr)):
+            raise ValueError(f'Gaps are not filled in with independent_gaps={independent_gaps}')
+        metrics = error_metrics(true_values, withoutgap_arr[ids_gaps])
+        print(f'independent_gaps={independent_gaps}', f'runtime - {round(runtime, 2)}',
+              f'MAE - {round(metrics["MAE"], 4)}', f'RMSE - {round(metrics["RMSE"], 4)}')
@@ -0,0 +1,43 @@
+import time
+
+import numpy as np
+import pandas as pd
+from fedot.core.chains.node import PrimaryNode
+from fedot.core.chains.ts_chain import TsForecastingChain
+
+from ts_gapfilling import ModelGapFiller, find_gap_runs, longest_known_part, rare_fit_forecast_length
+from ts_metrics import error_metrics
+
+# Проверка заполнения с однократным обучением цепочки (refit_every=0) на столбце
+# gap_7 из Sea_hour.csv: самый длинный пропуск (730 элементов) близок по длине к самой
+# длинной известной части ряда (850 элементов), поэтому цепочка прогнозирует его
+# по шагам, чтобы для обучения осталось достаточно строк матрицы лагов
+
+if __name__ == '__main__':
+    max_window_size = 100
+    data = pd.read_csv('./data/Sea_hour.csv')
+    with_gap_array = np.array(data['gap_7'])
+    ids_gaps = np.flatnonzero(with_gap_array == -100.0)
+    true_values = np.array(data['Height'])[ids_gaps]
+
+    _, run_lengths = find_gap_runs(with_gap_array == -100.0)
+    train_length = len(longest_known_part(with_gap_array, -100.0))
+    forecast_length = rare_fit_forecast_length(train_length, int(run_lengths.max()), max_window_size)
+    n_rows = train_length - max_window_size - forecast_length + 1
+    if n_rows < max_window_size:
+        raise ValueError(f'The chain is fitted on {n_rows} rows of the lagged table')
+
+    for refit_every in [0, 2]:
+        gapfiller = ModelGapFiller(gap_value=-100.0,
+                                   chain=TsForecastingChain(PrimaryNode('ridge')),
+                                   refit_every=refit_every)
+        start = time.perf_counter()
+        withoutgap_arr = gapfiller.forward_inverse_filling(with_gap_array,
+                                                           max_window_size=max_window_size)
+        runtime = time.perf_counter() - start
+
+        if np.any(withoutgap_arr == -100.0) or not np.all(np.isfinite(withoutgap_arr)):
+            raise ValueError(f'Gaps are not filled in with refit_every={refit_every}')
+        metrics = error_metrics(true_values, withoutgap_arr[ids_gaps])
+        print(f'refit_every={refit_every}', f'runtime - {round(runtime, 2)}',
+              f'MAE - {round(metrics["MAE"], 4)}', f'RMSE - {round(metrics["RMSE"], 4)}')
@@ -0,0 +1,171 @@
+import os
+from functools import partial
+from typing import Callable, Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+from fedot.core.chains.node import PrimaryNode
+from fedot.core.chains.ts_chain import TsForecastingChain
+
+from ts_gapfilling import ModelGapFiller, SimpleGapFiller
+
+
+class StreamGapFiller:
+    """
+    Class used for filling in the gaps in the time series, which is read and
+    written by chunks, so the memory does not depend on the length of the
+    time series. Every chunk is filled in together with the filled elements
+    before it (context) and the elements after it (lookahead), and the chunk
+    boundary is moved out of the intervals of gaps.
+
+    The result is equal to the filling of the whole time series if the
+    context and the lookahead contain all the elements used for the gap:
+    i.e. max_train_size elements for ModelGapFiller with max_train_size
+    (the inverse forecast needs them in the lookahead too) or n_neighbors
+    elements for the polynomial approximations. The methods, which use only
+    the initially known elements or the whole time series (batch polynomial
+    approximation with sequential=False, ModelGapFiller with refit_every != 1),
+    consider the filled context as known
+
+    :param fill_function: function, which fills in the gaps in the
+    one-dimensional array (i.e. SimpleGapFiller.linear_interpolation)
+    :param context_size: number of the filled elements before the chunk
+    :param lookahead_size: number of the elements after the chunk
+    :param chunk_size: number of the elements written at once
+    :param gap_value: value, which identify gap elements in array
+    """
+
+    def __init__(self, fill_function: Callable[[np.ndarray], np.ndarray],
+                 context_size: int, lookahead_size: int,
+                 chunk_size: int = 10000, gap_value: float = -100.0):
+        self.fill_function = fill_function
+        self.context_size = context_size
+        self.lookahead_size = lookahead_size
+        self.chunk_size = chunk_size
+        self.gap_value = gap_value
+
+    def fill_csv(self, input_path: str, output_path: str, column: str = 'gap'):
+        """
+        Method fills in the gaps in the column of the csv file and writes the
+        file with the filled column
+
+        :param input_path: path to the csv file with gaps
+        :param output_path: path to the csv file to write
+        :param column: name of the column with gaps
+        """
+
+        frames = pd.read_csv(input_path, chunksize=self.chunk_size)
+        is_first_chunk = True
+        for filled_frame in self.fill_frames(frames, column):
+            filled_frame.to_csv(output_path, mode='w' if is_first_chunk else 'a',
+                                header=is_first_chunk)
+            is_first_chunk = False
+
+    def fill_frames(self, frames: Iterable[pd.DataFrame],
+                    column: str = 'gap') -> Iterator[pd.DataFrame]:
+        """
+        Method fills in the gaps in the column of the sequence of data frames
+
+        :param frames: consecutive parts of the table
+        :param column: name of the column with gaps
+        :return: iterator over the consecutive parts of the table with the
+        filled column
+        """
+
+        frames = iter(frames)
+        context = np.zeros(0)
+        pending = pd.DataFrame()
+        required_size = self.chunk_size + self.lookahead_size
+        is_finished = False
+        while True:
+            # Read the chunk with the lookahead
+            while not is_finished and len(pending) < required_size:
+                frame = next(frames, None)
+                if frame is None:
+                    is_finished = True
+                else:
+                    pending = pd.concat([pending, frame])
+            if len(pending) == 0:
+                return
+
+            values = pending[column].to_numpy(dtype=float)
+            chunk_stop = self._chunk_stop(values == self.gap_value, is_finished)
+            if not is_finished and chunk_stop + self.lookahead_size > len(values):
+                # The interval of gaps at the boundary moved it forward
+                required_size = chunk_stop + self.lookahead_size
+                continue
+            chunk_stop = min(chunk_stop, len(values))
+            required_size = self.chunk_size + self.lookahead_size
+
+            filled_values = self.fill_function(np.concatenate((context, values)))
+            chunk_values = filled_values[len(context):len(context) + chunk_stop]
+
+            filled_frame = pending.iloc[:chunk_stop].copy()
+            filled_frame[column] = chunk_values
+            yield filled_frame
+
+            pending = pending.iloc[chunk_stop:]
+            context = np.concatenate((context, chunk_values))
+            context = context[len(context) - min(self.context_size, len(context)):]
+
+    def _chunk_stop(self, is_gap: np.ndarray, is_finished: bool) -> int:
+        """
+        Method finds the end of the chunk, which is not inside the interval
+        of gaps
+
+        :param is_gap: boolean array with True for the gap elements of the
+        pending part of the time series
+        :param is_finished: if True, there are no more elements to read
+        :return: number of the elements in the chunk (more than the pending
+        ones if the interval of gaps may continue after them)
+        """
+
+        if is_finished and len(is_gap) <= self.chunk_size:
+            return len(is_gap)
+        chunk_stop = min(self.chunk_size, len(is_gap))
+        if not is_gap[chunk_stop - 1]:
+            return chunk_stop
+        if chunk_stop < len(is_gap) and not is_gap[chunk_stop]:
+            return chunk_stop
+
+        # The interval of gaps is moved to the next chunk or, if it starts
+        # the chunk, is included in the chunk entirely
+        known_before = np.flatnonzero(~is_gap[:chunk_stop])
+        if len(known_before) > 0:
+            return int(known_before[-1]) + 1
+        known_after = np.flatnonzero(~is_gap[chunk_stop:])
+        if len(known_after) > 0:
+            return chunk_stop + int(known_after[0])
+        return len(is_gap) if is_finished else len(is_gap) + 1
+
+
+folder_to_save = './iccs_article/stream'
+
+if __name__ == '__main__':
+
+    # Потоковое заполнение пропусков с записью результата по частям
+    for file in ['Synthetic.csv', 'Sea_hour.csv', 'Sea_10_240.csv']:
+        print(file)
+        # Create folder if it doesnt exists
+        if os.path.isdir(folder_to_save) == False:
+            os.makedirs(folder_to_save)
+
+        # Линейная интерполяция использует по одному известному элементу с каждой стороны
+        simple_gapfiller = SimpleGapFiller(gap_value=-100.0)
+        stream_gapfiller = StreamGapFiller(simple_gapfiller.linear_interpolation,
+                                           context_size=1, lookahead_size=1,
+                                           chunk_size=1000)
+        stream_gapfiller.fill_csv(f'./data/{file}',
+                                  os.path.join(folder_to_save, f'linear_{file}'))
+
+        # Цепочка из одной модели обучается на 1000 элементах перед пропуском
+        max_train_size = 1000
+        model_gapfiller = ModelGapFiller(gap_value=-100.0,
+                                         chain=TsForecastingChain(PrimaryNode('ridge')),
+                                         max_train_size=max_train_size)
+        stream_gapfiller = StreamGapFiller(partial(model_gapfiller.forward_filling,
+                                                   max_window_size=100),
+                                           context_size=max_train_size, lookahead_size=0,
+                                           chunk_size=1000)
+        stream_gapfiller.fill_csv(f'./data/{file}',
+                                  os.path.join(folder_to_save, f'fedot_ridge_{file}'))
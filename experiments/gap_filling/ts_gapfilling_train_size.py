@@ -0,0 +1,63 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from fedot.core.chains.node import PrimaryNode
+from fedot.core.chains.ts_chain import TsForecastingChain
+
+from ts_gapfilling import ModelGapFiller
+from ts_metrics import error_metrics
+
+# Сравнение точности и времени восстановления пропусков при ограничении
+# обучающей выборки последними max_train_size элементами перед пропуском
+
+folder_to_save = './iccs_article/train_size'
+
+# Размер окна и множители окна для длины обучающей выборки (None - весь ряд)
+max_window_size = 100
+window_multipliers = [2, 5, 10, 20, None]
+
+
+def fill_with_train_size(with_gap_array, max_train_size, gap_value=-100.0):
+    # Цепочка из одной модели
+    chain = TsForecastingChain(PrimaryNode('ridge'))
+    gapfiller = ModelGapFiller(gap_value=gap_value,
+                               chain=chain,
+                               max_train_size=max_train_size)
+
+    start_time = time.perf_counter()
+    withoutgap_arr = gapfiller.forward_filling(with_gap_array,
+                                               max_window_size=max_window_size)
+    return withoutgap_arr, time.perf_counter() - start_time
+
+
+if __name__ == '__main__':
+
+    results = []
+    for file in ['Synthetic.csv', 'Sea_hour.csv', 'Sea_10_240.csv']:
+        data = pd.read_csv(f'./data/{file}')
+        with_gap_array = np.array(data['gap'])
+        ids_gaps = np.flatnonzero(with_gap_array == -100.0)
+        true_values = np.array(data['Height'])[ids_gaps]
+
+        for multiplier in window_multipliers:
+            max_train_size = None if multiplier is None else multiplier * max_window_size
+            withoutgap_arr, fill_time = fill_with_train_size(with_gap_array, max_train_size)
+            metrics = error_metrics(true_values, withoutgap_arr[ids_gaps])
+
+            result = {'file': file,
+                      'max_train_size': max_train_size or len(with_gap_array),
+                      'fill_time': round(fill_time, 2),
+                      'MAE': round(metrics['MAE'], 4),
+                      'RMSE': round(metrics['RMSE'], 4)}
+            print(result)
+            results.append(result)
+
+    results = pd.DataFrame(results)
+    print(results.to_string(index=False))
+
+    # Create folder if it doesnt exists
+    if os.path.isdir(folder_to_save) == False:
+        os.makedirs(folder_to_save)
+    results.to_csv(os.path.join(folder_to_save, 'train_size.csv'), index=False)
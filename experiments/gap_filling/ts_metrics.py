@@ -0,0 +1,64 @@
+from typing import Dict, Union
+
+import numpy as np
+
+METRICS = ['MAE', 'RMSE', 'MedianAE', 'MAPE']
+
+
+def error_metrics(true_values, predicted_values, mask=None,
+                  eps: float = 0.001) -> Dict[str, Union[float, np.ndarray]]:
+    """
+    Function calculates MAE, RMSE, MedianAE and MAPE (in percents) from one
+    array of the absolute errors. The inputs are not changed: the zero true
+    values are replaced by eps only in the denominator of MAPE
+
+    :param true_values: true values as a vector or as a matrix with the
+    vector per row
+    :param predicted_values: predicted values as a vector or as a matrix with
+    the vector per row (i.e. the values restored by several methods or in
+    several mask columns), broadcastable with true_values
+    :param mask: boolean array broadcastable with the values, only the
+    elements with True are used (i.e. the gaps of the mask column per row)
+    :param eps: denominator of MAPE for the zero true values
+    :return: dict with the metric values, the value is the float for the
+    vectors and the array with the value per row for the matrices (nan for
+    the rows without the elements)
+    """
+
+    true_values = np.asarray(true_values, dtype=float)
+    predicted_values = np.asarray(predicted_values, dtype=float)
+    abs_errors = np.abs(predicted_values - true_values)
+    abs_percentage_errors = abs_errors / np.where(true_values == 0.0, eps, np.abs(true_values))
+    is_batch = abs_errors.ndim > 1 or (mask is not None and np.ndim(mask) > 1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if mask is None:
+            metrics = {'MAE': np.mean(abs_errors, axis=-1),
+                       'RMSE': np.sqrt(np.mean(abs_errors ** 2, axis=-1)),
+                       'MedianAE': np.median(abs_errors, axis=-1),
+                       'MAPE': np.mean(abs_percentage_errors, axis=-1) * 100}
+        else:
+            mask = np.broadcast_to(mask, np.broadcast(abs_errors, mask).shape)
+            abs_errors = np.broadcast_to(abs_errors, mask.shape)
+            abs_percentage_errors = np.broadcast_to(abs_percentage_errors, mask.shape)
+            counts = np.sum(mask, axis=-1)
+            masked_errors = np.where(mask, abs_errors, 0.0)
+            metrics = {'MAE': np.sum(masked_errors, axis=-1) / counts,
+                       'RMSE': np.sqrt(np.sum(masked_errors ** 2, axis=-1) / counts),
+                       'MedianAE': _masked_median(abs_errors, mask),
+                       'MAPE': np.sum(np.where(mask, abs_percentage_errors, 0.0), axis=-1) / counts * 100}
+
+    if is_batch:
+        return metrics
+    return {name: float(value) for name, value in metrics.items()}
+
+
+def _masked_median(values: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    # The excluded elements are moved to the end of the row by the sorting
+    sorted_values = np.sort(np.where(mask, values, np.inf), axis=-1)
+    counts = np.sum(mask, axis=-1)
+    lower_ids = np.maximum((counts - 1) // 2, 0)
+    upper_ids = np.maximum(counts // 2, 0)
+    lower = np.take_along_axis(sorted_values, lower_ids[..., np.newaxis], axis=-1)[..., 0]
+    upper = np.take_along_axis(sorted_values, upper_ids[..., np.newaxis], axis=-1)[..., 0]
+    return np.where(counts > 0, (lower + upper) / 2, np.nan)
@@ -0,0 +1,204 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+@dataclass
+class Job:
+    job_id: int
+    dataset: str
+    framework: str
+    attempts: int
+
+
+class JobQueue:
+    """
+    Queue of the (dataset, framework) jobs persisted in the SQLite file.
+    The file can be shared by the workers on one host or on several hosts
+    with the common filesystem. A worker holds a lease for the claimed job and
+    renews it while the job is running, so the job of the dead worker
+    returns to the queue when its lease expires.
+
+    The claims rely on the file locks of SQLite, which are unreliable on NFS, SMB and
+    the other network filesystems without the working POSIX locks. The file should be on
+    the local filesystem (the workers of one host) or on the shared filesystem with
+    the coherent locks (i.e. Lustre or GPFS mounted with the locking enabled), otherwise
+    two workers can claim the same job or corrupt the queue.
+
+    :param db_path: path to the SQLite file with the queue
+    :param lease_secs: time after which the job without renewed lease can be claimed again
+    :param max_attempts: number of attempts before the job is marked as failed
+    """
+
+    def __init__(self, db_path: str, lease_secs: int = 600, max_attempts: int = 3):
+        self.db_path = db_path
+        self.lease_secs = lease_secs
+        self.max_attempts = max_attempts
+        with self._connect() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS jobs ('
+                               'job_id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                               'dataset TEXT NOT NULL, '
+                               'framework TEXT NOT NULL, '
+                               'status TEXT NOT NULL, '
+                               'attempts INTEGER NOT NULL DEFAULT 0, '
+                               'worker TEXT, '
+                               'lease_expires REAL, '
+                               'result TEXT, '
+                               'error TEXT, '
+                               'UNIQUE (dataset, framework))')
+
+    @contextmanager
+    def _connect(self):
+        # the connection is opened per operation to be usable from the lease renewal thread
+        # and to avoid keeping the lock on the file shared between hosts
+        connection = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        try:
+            yield connection
+        finally:
+            if connection.in_transaction:
+                connection.rollback()
+            connection.close()
+
+    def add_jobs(self, dataset_names: List[str], frameworks: List[str]) -> int:
+        """ Adds the missing jobs; the already known jobs keep their state, so the sweep can be resumed """
+        with self._connect() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            cursor = connection.executemany('INSERT OR IGNORE INTO jobs (dataset, framework, status) VALUES (?, ?, ?)',
+                                            [(dataset, framework, PENDING)
+                                             for dataset in dataset_names for framework in frameworks])
+            connection.execute('COMMIT')
+            return cursor.rowcount
+
+    def claim(self, worker_id: str) -> Optional[Job]:
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            # the jobs of the dead workers that have exhausted the attempts are not retried anymore
+            connection.execute('UPDATE jobs SET status = ?, error = ? '
+                               'WHERE status = ? AND lease_expires < ? AND attempts >= ?',
+                               (FAILED, 'lease expired', RUNNING, now, self.max_attempts))
+            row = connection.execute('SELECT job_id, dataset, framework, attempts FROM jobs '
+                                     'WHERE status = ? OR (status = ? AND lease_expires < ?) '
+                                     'ORDER BY job_id LIMIT 1', (PENDING, RUNNING, now)).fetchone()
+            if row is None:
+                connection.execute('COMMIT')
+                return None
+            connection.execute('UPDATE jobs SET status = ?, worker = ?, lease_expires = ?, attempts = attempts + 1 '
+                               'WHERE job_id = ?', (RUNNING, worker_id, now + self.lease_secs, row['job_id']))
+            connection.execute('COMMIT')
+        return Job(job_id=row['job_id'], dataset=row['dataset'],
+                   framework=row['framework'], attempts=row['attempts'] + 1)
+
+    def renew(self, job: Job, worker_id: str) -> bool:
+        return self._update_own_job(job, worker_id, 'lease_expires = ?', (time.time() + self.lease_secs,))
+
+    def complete(self, job: Job, worker_id: str, result: Optional[dict]) -> bool:
+        return self._update_own_job(job, worker_id, 'status = ?, result = ?, error = NULL',
+                                    (DONE, json.dumps(result)))
+
+    def fail(self, job: Job, worker_id: str, error: str) -> bool:
+        status = FAILED if job.attempts >= self.max_attempts else PENDING
+        return self._update_own_job(job, worker_id, 'status = ?, error = ?', (status, error))
+
+    def _update_own_job(self, job: Job, worker_id: str, assignments: str, values: tuple) -> bool:
+        # the job could be reclaimed by another worker after the lease expiration
+        with self._connect() as connection:
+            cursor = connection.execute(f'UPDATE jobs SET {assignments} '
+                                        f'WHERE job_id = ? AND worker = ? AND status = ?',
+                                        values + (job.job_id, worker_id, RUNNING))
+            return cursor.rowcount == 1
+
+    def status_counts(self) -> Dict[str, int]:
+        with self._connect() as connection:
+            rows = connection.execute('SELECT status, COUNT(*) AS jobs_num FROM jobs GROUP BY status').fetchall()
+        return {row['status']: row['jobs_num'] for row in rows}
+
+    def results_by_dataset(self) -> Dict[str, Dict[str, dict]]:
+        """
+        Returns the jobs of the datasets with all the jobs finished (done or failed):
+        the dict with the status, the result (of the done job) and the error (of the failed job)
+        for every framework of the dataset
+        """
+        with self._connect() as connection:
+            rows = connection.execute('SELECT dataset, framework, status, result, error FROM jobs '
+                                      'ORDER BY job_id').fetchall()
+        results = {}
+        unfinished = set()
+        for row in rows:
+            if row['status'] not in [DONE, FAILED]:
+                unfinished.add(row['dataset'])
+                continue
+            result = json.loads(row['result']) if row['status'] == DONE else None
+            results.setdefault(row['dataset'], {})[row['framework']] = {'status': row['status'],
+                                                                        'result': result,
+                                                                        'error': row['error']}
+        return {dataset: result for dataset, result in results.items() if dataset not in unfinished}
+
+
+class _LeaseKeeper(threading.Thread):
+    def __init__(self, queue: JobQueue, job: Job, worker_id: str):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.job = job
+        self.worker_id = worker_id
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.queue.lease_secs / 3):
+            if not self.queue.renew(self.job, self.worker_id):
+                print(f'Lease for {self.job.dataset}/{self.job.framework} is lost')
+                return
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def default_worker_id() -> str:
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def run_worker(queue: JobQueue, job_func: Callable[[Job], Optional[dict]],
+               worker_id: Optional[str] = None, poll_secs: int = 30):
+    """
+    Executes the jobs from the queue until there are no pending or running jobs.
+
+    :param queue: queue to take the jobs from
+    :param job_func: function that executes the job and returns its JSON-serializable result
+    :param worker_id: unique name of the worker (host and pid are used by default)
+    :param poll_secs: delay before the next claim if the remaining jobs are leased by other workers
+    """
+    worker_id = worker_id or default_worker_id()
+    while True:
+        job = queue.claim(worker_id)
+        if job is None:
+            if queue.status_counts().get(RUNNING, 0) == 0:
+                return
+            # the running jobs can return to the queue if their workers are dead
+            time.sleep(poll_secs)
+            continue
+
+        print(f'{worker_id}: RUN {job.framework} ON {job.dataset} (attempt {job.attempts})')
+        lease_keeper = _LeaseKeeper(queue, job, worker_id)
+        lease_keeper.start()
+        try:
+            result = job_func(job)
+        except Exception as ex:
+            lease_keeper.stop()
+            print(f'{worker_id}: exception on {job.dataset}/{job.framework}: {ex}')
+            queue.fail(job, worker_id, f'{type(ex).__name__}: {ex}')
+        else:
+            lease_keeper.stop()
+            queue.complete(job, worker_id, result)
@@ -4,47 +4,180 @@ Link to download: https://www.oracle.com/java/technologies/javase-jdk8-downloads
 """
 
 import os
+from contextlib import contextmanager
+from multiprocessing import util
+from typing import Optional
 
 import h2o
-
-from benchmark_utils import (get_h2o_connect_config, get_models_hyperparameters)
+import numpy as np
+from h2o import H2OFrame
+from h2o.automl import H2OAutoML
+from h2o.exceptions import H2OConnectionError
+
+from artifact_store import ArtifactStore
+from benchmark_utils import (get_h2o_connect_config, get_models_hyperparameters, models_artifact_store)
+from dataset_store import case_input_data, input_data_hash
 from fedot.core.data.data import InputData
-from fedot.core.models.evaluation.automl_eval import fit_h2o, predict_h2o
-
-CURRENT_PATH = str(os.path.dirname(__file__))
+from fedot.core.models.evaluation.automl_eval import predict_h2o
+from resource_usage import measure_phase
+
+# prefix of the cluster names, the process id is appended so every worker has its own cluster
+H2O_CLUSTER_NAME = 'h2o_server'
+# number of the port pairs (H2O uses the port and the next one) the workers are spread over
+H2O_PORT_SLOTS = 500
+
+
+class H2OSession:
+    """
+    Local H2O cluster that is started once per worker process and reused by the runs.
+    Every process gets its own cluster name and port (offset by the process id from the port of
+    get_h2o_connect_config), so the parallel workers do not attach to the cluster of each other.
+    The cluster is checked before every run and restarted if it is not healthy,
+    the frames and models created by the run are removed after it and
+    the cluster started by the process is shut down at the exit.
+
+    :param nthreads: number of the threads of the cluster (-1 for all the cores)
+    :param max_mem_size: maximal heap size of the cluster (i.e. '8G'), the JVM default if None
+    """
+    _current: Optional['H2OSession'] = None
+
+    def __init__(self, nthreads: int = -1, max_mem_size: Optional[str] = None):
+        self.nthreads = nthreads
+        self.max_mem_size = max_mem_size
+        self._is_owner = False
+
+    @staticmethod
+    def current(nthreads: int = -1, max_mem_size: Optional[str] = None) -> 'H2OSession':
+        """ Returns the session of the process; the parameters are applied when the session is created """
+        if H2OSession._current is None:
+            H2OSession._current = H2OSession(nthreads=nthreads, max_mem_size=max_mem_size)
+            # unlike atexit, the finalizer is called at the exit of the multiprocessing workers too
+            util.Finalize(None, H2OSession._current.shutdown, exitpriority=10)
+        return H2OSession._current
+
+    @staticmethod
+    def is_healthy() -> bool:
+        cluster = h2o.cluster()
+        try:
+            return cluster is not None and cluster.is_running() and cluster.cloud_healthy
+        except Exception:
+            return False
+
+    @staticmethod
+    def cluster_name() -> str:
+        return f'{H2O_CLUSTER_NAME}_{os.getpid()}'
+
+    def start(self, attempts: int = 5):
+        if self.is_healthy() and h2o.cluster().cloud_name == self.cluster_name():
+            return
+        ip, base_port = get_h2o_connect_config()
+        slot = os.getpid() % H2O_PORT_SLOTS
+        for attempt in range(attempts):
+            port = base_port + 2 * ((slot + attempt) % H2O_PORT_SLOTS)
+            try:
+                h2o.init(ip=ip, port=port, name=self.cluster_name(),
+                         nthreads=self.nthreads, max_mem_size=self.max_mem_size)
+                break
+            except H2OConnectionError:
+                # the port is taken by the cluster of another process, the next one is tried
+                if attempt == attempts - 1:
+                    raise
+        # only the cluster started by this process is cleaned and shut down by it
+        self._is_owner = h2o.connection().local_server is not None
+
+    @contextmanager
+    def run(self):
+        """ Provides the running cluster for the block and removes the objects created in it """
+        self.start()
+        initial_keys = self._keys()
+        try:
+            yield
+        finally:
+            self._remove_new_keys(initial_keys)
+
+    @staticmethod
+    def _keys() -> set:
+        return set(h2o.ls()['key'])
+
+    def _remove_new_keys(self, initial_keys: set):
+        if not self._is_owner or not self.is_healthy():
+            return
+        try:
+            new_keys = self._keys() - initial_keys
+            if new_keys:
+                h2o.remove(list(new_keys))
+        except Exception as ex:
+            print(f'H2O cleanup failed: {ex}')
+
+    def shutdown(self):
+        if self._is_owner and self.is_healthy():
+            h2o.cluster().shutdown(prompt=False)
+        self._is_owner = False
+
+
+def fit_h2o(train_data: InputData, max_models: int, max_runtime_secs: int):
+    """
+    Fits H2OAutoML in the cluster of the session. Unlike fit_h2o of FEDOT it does not call h2o.init,
+    which would connect to the fixed port instead of the cluster of the worker
+    """
+    frame = H2OFrame(python_obj=np.concatenate((train_data.features, train_data.target.reshape(-1, 1)), 1))
+    train_frame, valid_frame = frame.split_frame(ratios=[0.85])
+
+    # make sure that your target column is the last one
+    target_name = train_frame.columns[-1]
+    predictor_names = train_frame.columns.remove(target_name)
+    train_frame[target_name] = train_frame[target_name].asfactor()
+
+    model = H2OAutoML(max_models=max_models, seed=1, max_runtime_secs=max_runtime_secs)
+    model.train(x=predictor_names, y=target_name, training_frame=train_frame, validation_frame=valid_frame)
+    return model.leader
+
+
+def save_h2o_model(model, dir_path: str):
+    exported_model_path = h2o.save_model(model=model, path=dir_path)
+    os.replace(exported_model_path, os.path.join(dir_path, 'model'))
+
+
+def load_h2o_model(dir_path: str):
+    return h2o.load_model(os.path.join(dir_path, 'model'))
 
 
 def run_h2o(params: 'ExecutionParams'):
-    train_file_path = params.train_file
-    test_file_path = params.test_file
     case_label = params.case_label
     task = params.task
 
     config_data = get_models_hyperparameters()['H2O']
-    max_models = config_data['MAX_MODELS']
     max_runtime_secs = config_data['MAX_RUNTIME_SECS']
 
-    result_filename = f'{case_label}_m{max_models}_rs{max_runtime_secs}_{task.name}'
-    exported_model_path = os.path.join(CURRENT_PATH, result_filename)
-
-    # TODO Regression
-    if result_filename not in os.listdir(CURRENT_PATH):
-        train_data = InputData.from_csv(train_file_path)
-        best_model = fit_h2o(train_data, round(max_runtime_secs / 60))
-        temp_exported_model_path = h2o.save_model(model=best_model, path=CURRENT_PATH)
+    with measure_phase('load'):
+        train_data, test_frame = case_input_data(params)
 
-        os.renames(temp_exported_model_path, exported_model_path)
+    artifact_store = models_artifact_store()
+    # the resources of the cluster do not affect the fitted model
+    fit_hyperparameters = {name: value for name, value in config_data.items()
+                           if name not in ['NTHREADS', 'MAX_MEM_SIZE']}
+    artifact_key = ArtifactStore.artifact_key('h2o', {**fit_hyperparameters, 'task': task.name},
+                                              data_hash=input_data_hash(train_data), packages=['h2o', 'fedot'])
 
-    ip, port = get_h2o_connect_config()
-    h2o.init(ip=ip, port=port, name='h2o_server')
+    session = H2OSession.current(nthreads=params.n_jobs or config_data['NTHREADS'],
+                                 max_mem_size=config_data['MAX_MEM_SIZE'])
+    with measure_phase('start'):
+        session.start()
 
-    imported_model = h2o.load_model(exported_model_path)
+    with session.run():
+        with measure_phase('load'):
+            imported_model = artifact_store.load(artifact_key, load_h2o_model)
 
-    test_frame = InputData.from_csv(test_file_path)
-    true_target = test_frame.target
+        # TODO Regression
+        if imported_model is None:
+            with measure_phase('fit'):
+                imported_model = fit_h2o(train_data, config_data['MAX_MODELS'], max_runtime_secs)
+            artifact_store.save(artifact_key, lambda dir_path: save_h2o_model(imported_model, dir_path),
+                                meta={'case_label': case_label})
 
-    predicted = predict_h2o(imported_model, test_frame)
+        true_target = test_frame.target
 
-    h2o.shutdown(prompt=False)
+        with measure_phase('predict'):
+            predicted = predict_h2o(imported_model, test_frame)
 
     return true_target, predicted
@@ -1,21 +1,20 @@
 import autokeras as ak
 
 from benchmark_utils import get_models_hyperparameters
-from fedot.core.data.data import InputData
+from dataset_store import case_input_data
 from fedot.core.repository.tasks import TaskTypesEnum
+from resource_usage import measure_phase
 
 
 def run_autokeras(params: 'ExecutionParams'):
-    train_file_path = params.train_file
-    test_file_path = params.test_file
     task = params.task
 
     config_data = get_models_hyperparameters()['autokeras']
     max_trial = config_data['MAX_TRIAL']
     epoch = config_data['EPOCH']
 
-    train_data = InputData.from_csv(train_file_path)
-    test_data = InputData.from_csv(test_file_path)
+    with measure_phase('load'):
+        train_data, test_data = case_input_data(params)
 
     # TODO Save model to file
 
@@ -26,8 +25,10 @@ def run_autokeras(params: 'ExecutionParams'):
 
     model = estimator(max_trials=max_trial)
 
-    model.fit(train_data.features, train_data.target, epochs=epoch)
+    with measure_phase('fit'):
+        model.fit(train_data.features, train_data.target, epochs=epoch)
 
-    predicted = model.predict(test_data.features)
+    with measure_phase('predict'):
+        predicted = model.predict(test_data.features)
 
     return test_data.target, predicted
@@ -6,7 +6,6 @@ from pickle import dump, load
 import numpy as np
 from fedot.core.composer.gp_composer.gp_composer import GPComposerBuilder, GPComposerRequirements
 from fedot.core.composer.visualisation import ComposerVisualiser
-from fedot.core.data.data import InputData
 from fedot.core.repository.model_types_repository import ModelTypesRepository
 from fedot.core.repository.quality_metrics_repository import \
     (ClassificationMetricsEnum,
@@ -14,33 +13,27 @@ from fedot.core.repository.quality_metrics_repository import \
      RegressionMetricsEnum)
 from fedot.core.repository.tasks import Task, TaskTypesEnum
 
-from benchmark_utils import get_models_hyperparameters
+from artifact_store import ArtifactStore
+from benchmark_utils import get_models_hyperparameters, models_artifact_store
+from dataset_store import case_input_data, input_data_hash
+from resource_usage import limit_native_threads, measure_phase
 
 random.seed(1)
 np.random.seed(1)
 
 
-def save_fedot_model(chain, file_name: str):
-    path_to_file = str(os.path.dirname(__file__))
-    with open(f'{path_to_file}/{file_name}.pkl', 'wb') as pickle_file:
+def save_fedot_model(chain, dir_path: str):
+    with open(os.path.join(dir_path, 'chain.pkl'), 'wb') as pickle_file:
         dump(chain, pickle_file)
-    ComposerVisualiser.visualise(chain, f'{path_to_file}/{file_name}.png')
+    ComposerVisualiser.visualise(chain, os.path.join(dir_path, 'chain.png'))
 
 
-def load_fedot_model(file_name):
-    path_to_file = str(os.path.dirname(__file__))
-    try:
-        if os.path.exists(f'{path_to_file}/{file_name}.pkl'):
-            with open(f'{path_to_file}/{file_name}.pkl', 'rb') as pickle_file:
-                return load(pickle_file)
-    except Exception as ex:
-        print(f'Model load error {ex}')
-    return None
+def load_fedot_model(dir_path: str):
+    with open(os.path.join(dir_path, 'chain.pkl'), 'rb') as pickle_file:
+        return load(pickle_file)
 
 
 def run_fedot(params: 'ExecutionParams'):
-    train_file_path = params.train_file
-    test_file_path = params.test_file
     case_label = params.case_label
     task_type = params.task
 
@@ -54,14 +47,18 @@ def run_fedot(params: 'ExecutionParams'):
     metric_func = MetricsRepository().metric_by_id(metric)
 
     task = Task(task_type)
-    dataset_to_compose = InputData.from_csv(train_file_path, task=task)
-    dataset_to_validate = InputData.from_csv(test_file_path, task=task)
+    with measure_phase('load'):
+        dataset_to_compose, dataset_to_validate = case_input_data(params, task=task)
 
     models_hyperparameters = get_models_hyperparameters()['FEDOT']
     cur_lead_time = models_hyperparameters['MAX_RUNTIME_MINS']
 
-    saved_model_name = f'fedot_{case_label}_{task_type.name}_{cur_lead_time}_{metric.name}'
-    loaded_model = load_fedot_model(saved_model_name)
+    artifact_store = models_artifact_store()
+    artifact_key = ArtifactStore.artifact_key('fedot', {**models_hyperparameters,
+                                                        'task': task_type.name, 'metric': metric.name},
+                                              data_hash=input_data_hash(dataset_to_compose))
+    with measure_phase('load'):
+        loaded_model = artifact_store.load(artifact_key, load_fedot_model)
 
     if not loaded_model:
         generations = models_hyperparameters['GENERATIONS']
@@ -86,14 +83,18 @@ def run_fedot(params: 'ExecutionParams'):
         builder = GPComposerBuilder(task).with_requirements(composer_requirements).with_metrics(metric_func)
         gp_composer = builder.build()
 
-        chain_gp_composed = gp_composer.compose_chain(data=dataset_to_compose)
+        # the models of fedot take no n_jobs, so the cores of the run limit their thread pools
+        with measure_phase('fit'), limit_native_threads(params.n_jobs):
+            chain_gp_composed = gp_composer.compose_chain(data=dataset_to_compose)
 
-        chain_gp_composed.fit_from_scratch(input_data=dataset_to_compose)
-        save_fedot_model(chain_gp_composed, saved_model_name)
+            chain_gp_composed.fit_from_scratch(input_data=dataset_to_compose)
+        artifact_store.save(artifact_key, lambda dir_path: save_fedot_model(chain_gp_composed, dir_path),
+                            meta={'case_label': case_label})
     else:
         chain_gp_composed = loaded_model
 
-    evo_predicted = chain_gp_composed.predict(dataset_to_validate)
-    evo_predicted_labels = chain_gp_composed.predict(dataset_to_validate, output_mode='labels')
+    with measure_phase('predict'), limit_native_threads(params.n_jobs):
+        evo_predicted = chain_gp_composed.predict(dataset_to_validate)
+        evo_predicted_labels = chain_gp_composed.predict(dataset_to_validate, output_mode='labels')
 
     return dataset_to_validate.target, evo_predicted.predict, evo_predicted_labels.predict
@@ -2,48 +2,77 @@ import os
 
 import joblib
 
-from benchmark_utils import get_models_hyperparameters
+from artifact_store import ArtifactStore
+from benchmark_utils import get_models_hyperparameters, models_artifact_store
+from dataset_store import case_input_data, input_data_hash
 from fedot.core.data.data import InputData
-from fedot.core.models.evaluation.automl_eval import fit_tpot, predict_tpot_class, predict_tpot_reg
+from fedot.core.models.evaluation.automl_eval import predict_tpot_class, predict_tpot_reg
 from fedot.core.repository.tasks import Task, TaskTypesEnum
+from resource_usage import measure_phase
+from tpot import TPOTClassifier, TPOTRegressor
+
+
+def fit_tpot(data: InputData, models_hyperparameters: dict, n_jobs: int = 1):
+    """ Fits TPOT as fit_tpot of FEDOT does, with the hyperparameters of the benchmark and n_jobs processes """
+    if data.task.task_type == TaskTypesEnum.classification:
+        estimator = TPOTClassifier
+    elif data.task.task_type == TaskTypesEnum.regression:
+        estimator = TPOTRegressor
+    else:
+        raise NotImplementedError()
+
+    model = estimator(generations=models_hyperparameters['GENERATIONS'],
+                      population_size=models_hyperparameters['POPULATION_SIZE'],
+                      verbosity=2,
+                      random_state=42,
+                      max_time_mins=models_hyperparameters['MAX_RUNTIME_MINS'],
+                      n_jobs=n_jobs)
+    model.fit(data.features, data.target)
+    return model
+
+
+def save_tpot_model(model, dir_path: str):
+    model.export(output_file_name=os.path.join(dir_path, 'pipeline.py'))
+    joblib.dump(model.fitted_pipeline_, os.path.join(dir_path, 'model.pkl'), compress=1)
+
+
+def load_tpot_model(dir_path: str):
+    return joblib.load(os.path.join(dir_path, 'model.pkl'))
 
 
 def run_tpot(params: 'ExecutionParams'):
-    train_file_path = params.train_file
-    test_file_path = params.test_file
     case_label = params.case_label
     task = params.task
 
     models_hyperparameters = get_models_hyperparameters()['TPOT']
-    generations = models_hyperparameters['GENERATIONS']
-    population_size = models_hyperparameters['POPULATION_SIZE']
 
-    result_model_filename = f'{case_label}_g{generations}' \
-                            f'_p{population_size}_{task.name}.pkl'
-    current_file_path = str(os.path.dirname(__file__))
-    result_file_path = os.path.join(current_file_path, result_model_filename)
+    with measure_phase('load'):
+        train_data, predict_data = case_input_data(params, task=Task(task))
 
-    train_data = InputData.from_csv(train_file_path, task=Task(task))
+    artifact_store = models_artifact_store()
+    # the model is fitted by fedot, so its version affects the result too
+    artifact_key = ArtifactStore.artifact_key('tpot', {**models_hyperparameters, 'task': task.name},
+                                              data_hash=input_data_hash(train_data), packages=['tpot', 'fedot'])
+    with measure_phase('load'):
+        imported_model = artifact_store.load(artifact_key, load_tpot_model)
 
-    if result_model_filename not in os.listdir(current_file_path):
-        # TODO change hyperparameters to actual from variable
-        model = fit_tpot(train_data, models_hyperparameters['MAX_RUNTIME_MINS'])
-
-        model.export(output_file_name=f'{result_model_filename[:-4]}_pipeline.py')
+    if imported_model is None:
+        with measure_phase('fit'):
+            model = fit_tpot(train_data, models_hyperparameters, n_jobs=params.n_jobs or 1)
 
+        artifact_store.save(artifact_key, lambda dir_path: save_tpot_model(model, dir_path),
+                            meta={'case_label': case_label})
         # sklearn pipeline object
-        fitted_model_config = model.fitted_pipeline_
-        joblib.dump(fitted_model_config, result_file_path, compress=1)
-
-    imported_model = joblib.load(result_file_path)
+        imported_model = model.fitted_pipeline_
 
-    predict_data = InputData.from_csv(test_file_path, task=Task(task))
     true_target = predict_data.target
     if task == TaskTypesEnum.regression:
-        predicted = predict_tpot_reg(imported_model, predict_data)
+        with measure_phase('predict'):
+            predicted = predict_tpot_reg(imported_model, predict_data)
         predicted_labels = predicted
     elif task == TaskTypesEnum.classification:
-        predicted, predicted_labels = predict_tpot_class(imported_model, predict_data)
+        with measure_phase('predict'):
+            predicted, predicted_labels = predict_tpot_class(imported_model, predict_data)
     else:
         print('Incorrect type of ml task')
         raise NotImplementedError()
@@ -0,0 +1,109 @@
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
+
+_active_usages = []
+
+
+@contextmanager
+def measure_phase(phase_name: str):
+    """
+    Adds the wall-clock time of the block to the phase of the measured run (i.e. 'load', 'fit', 'predict').
+    Does nothing outside of the collect_resource_usage block.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if _active_usages:
+            phases = _active_usages[-1]['phases']
+            phases[phase_name] = round(phases.get(phase_name, 0) + time.perf_counter() - start, 3)
+
+
+@contextmanager
+def limit_native_threads(threads_num: Optional[int]):
+    """
+    Limits the OpenMP and BLAS thread pools of the loaded libraries (i.e. xgboost and numpy used by
+    the frameworks without their own n_jobs) in the block. Does nothing if threads_num is None or
+    threadpoolctl is not installed, then only the limits of the environment variables are applied.
+    """
+    if threads_num is None or threadpool_limits is None:
+        yield
+        return
+    with threadpool_limits(limits=threads_num):
+        yield
+
+
+@contextmanager
+def collect_resource_usage():
+    """
+    Measures the wall-clock time, the CPU time of the process and its children and
+    the peak memory of the block. The yielded dict is filled at the exit of the block.
+    """
+    usage = {'phases': {}}
+    _active_usages.append(usage)
+    _reset_peak_rss()
+    start_wall_time = time.perf_counter()
+    start_times = os.times()
+    try:
+        yield usage
+    finally:
+        end_times = os.times()
+        usage['wall_time_secs'] = round(time.perf_counter() - start_wall_time, 3)
+        usage['cpu_user_secs'] = round(end_times.user - start_times.user, 3)
+        usage['cpu_system_secs'] = round(end_times.system - start_times.system, 3)
+        usage['children_cpu_user_secs'] = round(end_times.children_user - start_times.children_user, 3)
+        usage['children_cpu_system_secs'] = round(end_times.children_system - start_times.children_system, 3)
+        usage['peak_rss_mb'] = _peak_rss_mb()
+        usage['children_peak_rss_mb'] = _children_peak_rss_mb()
+        _active_usages.remove(usage)
+
+
+def _reset_peak_rss():
+    # Linux allows to reset the peak RSS of the process, so the peak of the block is measured
+    # instead of the peak of the whole process lifetime
+    try:
+        with open('/proc/self/clear_refs', 'w') as file:
+            file.write('5')
+    except OSError:
+        pass
+
+
+def _peak_rss_mb():
+    try:
+        with open('/proc/self/status', 'r') as file:
+            for line in file:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    return _max_rss_to_mb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def _children_peak_rss_mb():
+    # the finished children only (i.e. the JVM of h2o is counted after its shutdown)
+    if resource is None:
+        return None
+    return _max_rss_to_mb(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+
+def _max_rss_to_mb(max_rss: int) -> float:
+    # ru_maxrss is measured in bytes on macOS and in kilobytes on Linux
+    if sys.platform == 'darwin':
+        return round(max_rss / 1024 / 1024, 1)
+    return round(max_rss / 1024, 1)
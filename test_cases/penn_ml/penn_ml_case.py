@@ -1,15 +1,23 @@
+import argparse
+from multiprocessing import get_context
 from pathlib import Path
 
 import pandas as pd
-from pmlb import classification_dataset_names, fetch_data, regression_dataset_names
+from pmlb import classification_dataset_names, regression_dataset_names
 from pmlb.support_funcs import compute_imbalance
 
 from benchmark_model_types import BenchmarkModelTypesEnum
 from benchmark_utils import \
     (convert_json_stats_to_csv, get_models_hyperparameters,
-     get_penn_case_data_paths, save_metrics_result_file)
+     get_penn_case_data, get_penn_case_data_paths, save_metrics_result_file)
 from executor import CaseExecutor, ExecutionParams
 from fedot.core.repository.tasks import TaskTypesEnum
+from job_queue import FAILED, Job, JobQueue, run_worker
+
+PENN_ML_MODELS = [BenchmarkModelTypesEnum.baseline,
+                  BenchmarkModelTypesEnum.fedot,
+                  BenchmarkModelTypesEnum.tpot]
+PENN_ML_BOOTSTRAP_SAMPLES = 1000
 
 
 def _problem_and_metric_for_dataset(name_of_dataset: str, num_classes: int):
@@ -23,7 +31,7 @@ def _problem_and_metric_for_dataset(name_of_dataset: str, num_classes: int):
         return None, None
 
 
-if __name__ == '__main__':
+def _datasets_to_run() -> list:
     penn_data = Path('./datasets.csv')
     dataset = []
     if penn_data.is_file():
@@ -34,40 +42,91 @@ if __name__ == '__main__':
 
     if len(dataset) == 0:
         dataset = classification_dataset_names + regression_dataset_names
+    return [str(name_of_dataset) for name_of_dataset in dataset]
+
+
+def run_penn_ml_job(job: Job):
+    name_of_dataset = job.dataset
+    try:
+        penn_train, penn_test = get_penn_case_data(name_of_dataset)
+    except ValueError as ex:
+        print(ex)
+        return None
+    imbalance_report = compute_imbalance(penn_train['target'].values.tolist() +
+                                         penn_test['target'].values.tolist())
+    num_classes = imbalance_report[0]
+    problem_class, metric_names = _problem_and_metric_for_dataset(name_of_dataset, num_classes)
+    if not problem_class or not metric_names:
+        print(f'Incorrect dataset: {name_of_dataset}')
+        return None
+
+    train_file, test_file = get_penn_case_data_paths(name_of_dataset)
+    case_name = f'penn_ml_{name_of_dataset}'
+
+    return CaseExecutor(params=ExecutionParams(train_file=train_file,
+                                               test_file=test_file,
+                                               task=problem_class,
+                                               target_name='target',
+                                               case_label=case_name),
+                        models=[BenchmarkModelTypesEnum[job.framework]],
+                        metric_list=metric_names,
+                        bootstrap_samples=PENN_ML_BOOTSTRAP_SAMPLES).execute()
 
-    for name_of_dataset in dataset:
-        try:
-            pmlb_data = fetch_data(name_of_dataset)
-        except ValueError as ex:
-            print(ex)
-            continue
-        imbalance_report = compute_imbalance(pmlb_data['target'].values.tolist())
-        num_classes = imbalance_report[0]
-        problem_class, metric_names = _problem_and_metric_for_dataset(name_of_dataset, num_classes)
-        if not problem_class or not metric_names:
-            print(f'Incorrect dataset: {name_of_dataset}')
-            continue
 
-        train_file, test_file = get_penn_case_data_paths(name_of_dataset)
-        config_models_data = get_models_hyperparameters()
-        case_name = f'penn_ml_{name_of_dataset}'
-
-        try:
-            result_metrics = CaseExecutor(params=ExecutionParams(train_file=train_file,
-                                                                 test_file=test_file,
-                                                                 task=problem_class,
-                                                                 target_name='target',
-                                                                 case_label=case_name),
-                                          models=[BenchmarkModelTypesEnum.baseline,
-                                                  BenchmarkModelTypesEnum.fedot,
-                                                  BenchmarkModelTypesEnum.tpot],
-                                          metric_list=metric_names).execute()
-        except Exception as ex:
-            print(f'Exception on {name_of_dataset}: {ex}')
+def _run_local_worker(queue_path: str, lease_secs: int, max_attempts: int):
+    queue = JobQueue(queue_path, lease_secs=lease_secs, max_attempts=max_attempts)
+    run_worker(queue, run_penn_ml_job)
+
+
+def save_finished_datasets(queue: JobQueue) -> list:
+    config_models_data = get_models_hyperparameters()
+    saved_datasets = []
+    for name_of_dataset, jobs_by_framework in queue.results_by_dataset().items():
+        result_metrics = {}
+        for framework, job in jobs_by_framework.items():
+            if job['status'] == FAILED:
+                # the results of the other frameworks are saved, the failed job is recorded with its error
+                result_metrics[f'{framework}_metric'] = {'error': job['error']}
+            elif job['result']:
+                result_metrics.update(job['result'])
+        if not result_metrics:
+            # the dataset was skipped by all the workers
             continue
 
         result_metrics['hyperparameters'] = config_models_data
-
         save_metrics_result_file(result_metrics, file_name=f'penn_ml_metrics_for_{name_of_dataset}')
+        saved_datasets.append(name_of_dataset)
+    return saved_datasets
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='PMLB benchmark with the resumable queue of the '
+                                                 '(dataset, framework) jobs')
+    parser.add_argument('--queue', default='./penn_ml_jobs.sqlite',
+                        help='path to the queue file, it should be on the local filesystem or, for several hosts, '
+                             'on the shared filesystem with the reliable file locks (not NFS)')
+    parser.add_argument('--workers', type=int, default=1, help='number of the local worker processes')
+    parser.add_argument('--join', action='store_true',
+                        help='only execute the jobs of the existing queue (for the additional hosts)')
+    parser.add_argument('--lease-secs', type=int, default=600)
+    parser.add_argument('--max-attempts', type=int, default=3)
+    args = parser.parse_args()
+
+    jobs_queue = JobQueue(args.queue, lease_secs=args.lease_secs, max_attempts=args.max_attempts)
+    if not args.join:
+        jobs_queue.add_jobs(_datasets_to_run(), [model_type.name for model_type in PENN_ML_MODELS])
+
+    context = get_context('spawn')
+    workers = [context.Process(target=_run_local_worker,
+                               args=(args.queue, args.lease_secs, args.max_attempts))
+               for _ in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
 
-    convert_json_stats_to_csv(dataset)
+    print(f'Jobs status: {jobs_queue.status_counts()}')
+    if not args.join:
+        finished_datasets = save_finished_datasets(jobs_queue)
+        if finished_datasets:
+            convert_json_stats_to_csv(finished_datasets)